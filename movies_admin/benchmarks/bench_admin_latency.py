@@ -0,0 +1,99 @@
+"""Load test of admin pages served by a running instance.
+
+Logs in as a staff user and requests a page from several threads,
+then prints latency percentiles. Start the server with each database
+setup to compare, e.g. for gunicorn with 4 workers:
+
+    DB_CONN_MAX_AGE=0 DB_POOL_SIZE=0 gunicorn -w 4 config.wsgi
+    DB_CONN_MAX_AGE=60 DB_POOL_SIZE=0 gunicorn -w 4 config.wsgi
+    DB_CONN_MAX_AGE=0 DB_POOL_SIZE=1 gunicorn -w 4 config.wsgi
+
+and run against each of them:
+
+    python benchmarks/bench_admin_latency.py --user admin --password ...
+"""
+import argparse
+import http.cookiejar
+import statistics
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def login(base_url: str, user: str, password: str):
+    """Return an opener keeping the session of the logged in user."""
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(jar)
+    )
+    login_url = f'{base_url}/admin/login/'
+    opener.open(login_url).read()
+    csrf_token = next(
+        cookie.value for cookie in jar if cookie.name == 'csrftoken'
+    )
+    data = urllib.parse.urlencode(
+        {
+            'username': user,
+            'password': password,
+            'csrfmiddlewaretoken': csrf_token,
+            'next': '/admin/',
+        }
+    ).encode()
+    request = urllib.request.Request(
+        login_url, data=data, headers={'Referer': login_url}
+    )
+    response = opener.open(request)
+    response.read()
+    if response.geturl().startswith(login_url):
+        raise SystemExit('Login failed')
+    return opener
+
+
+def timed_get(opener, url: str) -> float:
+    started = time.perf_counter()
+    with opener.open(url) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def run(opener, url: str, requests: int, concurrency: int):
+    # the first requests open connections, they are not measured
+    for _ in range(concurrency):
+        timed_get(opener, url)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        latencies = sorted(
+            pool.map(lambda _: timed_get(opener, url), range(requests))
+        )
+        elapsed = time.perf_counter() - started
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(
+        f'{requests} requests in {elapsed:.2f} s, '
+        f'{requests / elapsed:.1f} req/s'
+    )
+    print(
+        f'latency ms: p50 {percentiles[49] * 1000:.1f}, '
+        f'p95 {percentiles[94] * 1000:.1f}, '
+        f'p99 {percentiles[98] * 1000:.1f}, '
+        f'max {latencies[-1] * 1000:.1f}'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--path', default='/admin/movies/genre/')
+    parser.add_argument('--user', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    opener = login(args.base_url, args.user, args.password)
+    run(
+        opener,
+        f'{args.base_url}{args.path}',
+        args.requests,
+        args.concurrency,
+    )
@@ -0,0 +1,124 @@
+"""Check that hot admin queries are served by indexes.
+
+Runs EXPLAIN for the queries of the admin pages and fails if any of
+them scans a whole large table. The planner prefers sequential scans
+on small tables, so load a large generated catalog first:
+
+    cd ../sqlite_to_postgres
+    python benchmarks/fixtures.py --scale medium --output /tmp/medium.sqlite
+    SQLITE_DB=/tmp/medium.sqlite python load_data.py
+    cd ../movies_admin
+    python benchmarks/check_admin_plans.py
+"""
+import json
+import os
+import sys
+
+import django
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection
+from django.db.models import Count, Q
+
+from movies.models import Filmwork, Genre, Person, PersonFilmwork
+
+MIN_ROWS = 100_000
+PAGE = 101
+
+
+def plan_of(queryset) -> dict:
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        (result,) = cursor.fetchone()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]['Plan']
+
+
+def scanned_tables(plan: dict):
+    """Yield tables read by sequential scans anywhere in the plan."""
+    if plan['Node Type'] == 'Seq Scan':
+        yield plan['Relation Name']
+    for child in plan.get('Plans', ()):
+        yield from scanned_tables(child)
+
+
+def estimated_rows(table: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class '
+            'WHERE oid = %s::regclass',
+            [f'content.{table}'],
+        )
+        return cursor.fetchone()[0]
+
+
+def hot_queries():
+    newest = Filmwork.objects.order_by('-created', '-id')
+    last = newest[PAGE - 1]
+    rare_type = (
+        Filmwork.objects.values('type')
+        .annotate(films=Count('id'))
+        .order_by('films')
+        .values_list('type', flat=True)
+        .first()
+    )
+    person = Person.objects.order_by('-created').first()
+    genre = Genre.objects.order_by('-created').first()
+    return (
+        ('film works, first page', newest[:PAGE]),
+        (
+            'film works, next page',
+            newest.filter(
+                Q(created__lt=last.created)
+                | Q(created=last.created, id__lt=last.id)
+            )[:PAGE],
+        ),
+        (
+            'film works of a type',
+            newest.filter(type=rare_type)[:PAGE],
+        ),
+        (
+            'film works of a person',
+            Filmwork.objects.filter(personfilmwork__person=person),
+        ),
+        (
+            'film works of a genre, first page',
+            newest.filter(genrefilmwork__genre=genre)[:PAGE],
+        ),
+        (
+            'people inline of a film work',
+            PersonFilmwork.objects.filter(film_work=last).select_related(
+                'person'
+            ),
+        ),
+        (
+            'people, first page',
+            Person.objects.order_by('-created', '-id')[:PAGE],
+        ),
+    )
+
+
+if __name__ == '__main__':
+    tables = ('film_work', 'person', 'person_film_work', 'genre_film_work')
+    small = [table for table in tables if estimated_rows(table) < MIN_ROWS]
+    if small:
+        sys.exit(
+            f'Too few rows in {", ".join(small)} for a meaningful plan, '
+            'load a larger catalog first.'
+        )
+
+    failed = False
+    for name, queryset in hot_queries():
+        seq_scans = sorted(set(scanned_tables(plan_of(queryset))))
+        if seq_scans:
+            failed = True
+            print(f'FAIL {name}: sequential scan of {", ".join(seq_scans)}')
+        else:
+            print(f'ok   {name}')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,139 @@
+import os
+import threading
+
+import psycopg2
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+# pools of the current process by database alias; a forked gunicorn
+# worker must not share connections of its parent, so pid is a part
+# of the key
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connection_is_usable(connection) -> bool:
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class ConnectionPool(ThreadedConnectionPool):
+    """Pool opening up to maxconn connections on demand and keeping them.
+
+    psycopg2 pools keep only minconn returned connections and close the
+    others, so with minconn=0 nothing is reused. Here minconn is raised
+    to maxconn once the pool is created without connecting, and getconn
+    waits up to timeout seconds for a connection when all are in use
+    instead of raising PoolError at once.
+    """
+
+    def __init__(self, maxconn: int, timeout: float, *args, **kwargs):
+        super().__init__(0, maxconn, *args, **kwargs)
+        self.minconn = self.maxconn
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError('connection pool exhausted')
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend with health checks and an in-process pool.
+
+    CONN_HEALTH_CHECKS checks a persistent connection before its first
+    use in a request, so a connection dropped by the server is replaced
+    instead of failing the request. POOL_SIZE > 0 keeps up to that many
+    connections per worker process: Django takes one from the pool
+    instead of connecting and gives it back instead of closing it,
+    waiting up to POOL_TIMEOUT seconds when all of them are in use.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_needed = False
+
+    @property
+    def pool(self):
+        size = self.settings_dict.get('POOL_SIZE', 0)
+        if not size:
+            return None
+        key = (self.alias, os.getpid())
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = ConnectionPool(
+                    size,
+                    self.settings_dict.get('POOL_TIMEOUT', 30),
+                    **self.get_connection_params(),
+                )
+            return _pools[key]
+
+    def get_new_connection(self, conn_params):
+        connection_pool = self.pool
+        if connection_pool is None:
+            return super().get_new_connection(conn_params)
+
+        connection = connection_pool.getconn()
+        while self.health_checks_enabled and not connection_is_usable(
+            connection
+        ):
+            connection_pool.putconn(connection, close=True)
+            connection = connection_pool.getconn()
+
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        # the same dummy loads() as the default backend registers
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        connection_pool = self.pool
+        if self.connection is None or connection_pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # a connection that failed is not given to the next request
+            connection_pool.putconn(
+                self.connection,
+                close=self.connection.closed or self.errors_occurred,
+            )
+
+    @property
+    def health_checks_enabled(self) -> bool:
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def close_if_unusable_or_obsolete(self):
+        # called at the start and at the end of every request
+        super().close_if_unusable_or_obsolete()
+        if self.connection is not None and self.health_checks_enabled:
+            self.health_check_needed = True
+
+    def ensure_connection(self):
+        if self.health_check_needed and self.connection is not None:
+            self.health_check_needed = False
+            if not self.in_atomic_block and not self.is_usable():
+                self.close()
+        super().ensure_connection()
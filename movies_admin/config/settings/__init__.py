@@ -3,6 +3,7 @@ from split_settings.tools import include
 settings = [
     'components/base.py',  # standard django settings
     'components/database.py',  # postgres
+    'components/imports.py',  # background imports of SQLite catalogs
 ]
 
 include(*settings)
@@ -7,12 +7,25 @@ load_dotenv()
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # стандартный бэкенд с проверкой и пулом соединений
+        'ENGINE': 'config.db_backends.postgresql',
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST', default='127.0.0.1'),
         'PORT': os.getenv('DB_PORT', default=5432),
+        # Сколько секунд держать соединение открытым между запросами,
+        # 0 - закрывать после каждого запроса.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        # Проверять постоянное соединение перед первым запросом к базе.
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', default='true').lower()
+            == 'true'
+        ),
+        # Размер пула соединений в каждом процессе, 0 - без пула.
+        'POOL_SIZE': int(os.getenv('DB_POOL_SIZE', default=0)),
+        # Сколько секунд ждать свободного соединения из пула.
+        'POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default=30)),
         'OPTIONS': {
             # Нужно явно указать схемы, с которыми будет работать приложение.
             'options': '-c search_path=public,content'
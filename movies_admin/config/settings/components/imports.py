@@ -0,0 +1,42 @@
+import os
+
+import config
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Каталог movies_admin; относительные пути ниже отсчитываются от него.
+PROJECT_DIR = os.path.dirname(
+    os.path.dirname(os.path.abspath(config.__file__))
+)
+
+# Загруженные через админку файлы, в том числе SQLite-каталоги для импорта.
+MEDIA_ROOT = os.path.join(
+    PROJECT_DIR, os.getenv('DJANGO_MEDIA_ROOT', default='media')
+)
+MEDIA_URL = '/media/'
+
+# Каталог sqlite_to_postgres, из которого импортируется пакет dataimporter.
+IMPORTER_PATH = os.path.normpath(
+    os.path.join(
+        PROJECT_DIR,
+        os.getenv('IMPORTER_PATH', default='../sqlite_to_postgres'),
+    )
+)
+# Переменные окружения начинаются с ADMIN_: IMPORT_WORKERS и
+# IMPORT_BATCH_SIZE из того же .env читает load_data.py.
+# Сколько загрузок выполняется одновременно в фоновых процессах;
+# каждый процесс gunicorn запускает свой пул из стольких процессов.
+IMPORT_WORKERS = int(os.getenv('ADMIN_IMPORT_WORKERS', default=1))
+# Строк в пачке; после каждой пачки транзакция фиксируется.
+IMPORT_BATCH_SIZE = int(os.getenv('ADMIN_IMPORT_BATCH_SIZE', default=1000))
+# Как часто в секундах сохранять статистику выполняющейся загрузки.
+IMPORT_PROGRESS_INTERVAL = float(
+    os.getenv('ADMIN_IMPORT_PROGRESS_INTERVAL', default=1)
+)
+# Через сколько секунд без сохранения статистики выполняющаяся загрузка
+# считается потерянной (например, при перезапуске gunicorn) и может
+# быть запущена ещё раз.
+IMPORT_STALE_TIMEOUT = float(
+    os.getenv('ADMIN_IMPORT_STALE_TIMEOUT', default=60)
+)
@@ -1,33 +1,120 @@
+import uuid
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import PermissionDenied
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    JsonResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
 from django.utils.translation import gettext_lazy as _
 
-from .models import Filmwork, Genre, GenreFilmwork, Person, PersonFilmwork
+from .export import FORMATS, ExportChangeList, export_response
+from .importer import is_stale, start_import
+from .models import (
+    Filmwork,
+    Genre,
+    GenreFilmwork,
+    ImportJob,
+    ImportStatus,
+    Person,
+    PersonFilmwork,
+)
+from .pagination import KeysetPaginationMixin
+from .widgets import PreloadedAutocompleteSelect
+
+
+class UUIDSearchMixin:
+    """Look up an id by the primary key instead of matching text.
+
+    Text search fields are backed by trigram indexes, while id::text
+    is not, so id is not in search_fields and a full id is searched
+    separately.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        try:
+            pk = uuid.UUID(search_term.strip())
+        except ValueError:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk=pk), False
 
 
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
+class PersonAdmin(KeysetPaginationMixin, UUIDSearchMixin, admin.ModelAdmin):
     list_display = ('full_name', 'created', 'modified')
-    search_fields = ('full_name', 'id')
+    search_fields = ('full_name',)
+    # autocomplete pages through people in this order
+    ordering = ('full_name',)
 
 
 @admin.register(Genre)
-class GenreAdmin(admin.ModelAdmin):
+class GenreAdmin(UUIDSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'description', 'created', 'modified')
     list_filter = ('name',)
-    search_fields = ('id',)
+    search_fields = ('name',)
+    ordering = ('name',)
     empty_value_display = _('-empty-')
 
 
-class PersonFilmworkInline(admin.TabularInline):
+class PreloadedRelationForm(forms.ModelForm):
+    """Give autocomplete widgets the related objects of the row."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance._state.adding:
+            return
+        for name, field in self.fields.items():
+            # admin wraps widgets of relations to add the "+" link
+            widget = getattr(field.widget, 'widget', field.widget)
+            if isinstance(widget, PreloadedAutocompleteSelect):
+                widget.selected = getattr(self.instance, name)
+
+
+class AutocompleteInline(admin.TabularInline):
+    """Inline choosing related objects by search instead of a select.
+
+    A select lists every related object in every row, which is too
+    much for people. Related objects are loaded with the rows, so
+    rendering them makes no extra queries.
+    """
+
+    form = PreloadedRelationForm
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .select_related(*self.get_autocomplete_fields(request))
+        )
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class PersonFilmworkInline(AutocompleteInline):
     model = PersonFilmwork
+    autocomplete_fields = ('person',)
 
 
-class GenreFilmworkInline(admin.TabularInline):
+class GenreFilmworkInline(AutocompleteInline):
     model = GenreFilmwork
+    autocomplete_fields = ('genre',)
 
 
 @admin.register(Filmwork)
-class FilmworkAdmin(admin.ModelAdmin):
+class FilmworkAdmin(
+    KeysetPaginationMixin, UUIDSearchMixin, admin.ModelAdmin
+):
     inlines = (
         GenreFilmworkInline,
         PersonFilmworkInline,
@@ -42,5 +129,140 @@ class FilmworkAdmin(admin.ModelAdmin):
         'modified',
     )
     list_filter = ('type',)
-    search_fields = ('title', 'description', 'id')
+    search_fields = ('title', 'description')
     empty_value_display = _('-empty-')
+    actions = ('export_csv', 'export_ndjson')
+
+    def get_urls(self):
+        return [
+            path(
+                'export/',
+                self.admin_site.admin_view(self.export_view),
+                name='movies_filmwork_export',
+            ),
+            *super().get_urls(),
+        ]
+
+    def export_view(self, request):
+        """Stream film works of the changelist with its filters and search.
+
+        The format is given by the format parameter, other parameters
+        are the ones of the changelist page.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        request.GET = request.GET.copy()
+        export_format = request.GET.pop('format', ['csv'])[-1]
+        if export_format not in FORMATS:
+            raise Http404
+        # get_changelist gives the changelist which does not page rows
+        request.exporting = True
+        try:
+            changelist = self.get_changelist_instance(request)
+        except IncorrectLookupParameters:
+            # unknown filters or search parameters
+            return HttpResponseBadRequest()
+        return export_response(
+            changelist.queryset, export_format, 'film_works'
+        )
+
+    def get_changelist(self, request, **kwargs):
+        if getattr(request, 'exporting', False):
+            return ExportChangeList
+        return super().get_changelist(request, **kwargs)
+
+    @admin.action(description=_('Export selected film works as CSV'))
+    def export_csv(self, request, queryset):
+        return export_response(queryset, 'csv', 'film_works')
+
+    @admin.action(description=_('Export selected film works as NDJSON'))
+    def export_ndjson(self, request, queryset):
+        return export_response(queryset, 'ndjson', 'film_works')
+
+
+class ImportJobForm(forms.ModelForm):
+    # the header every SQLite 3 database file starts with
+    SQLITE_HEADER = b'SQLite format 3\x00'
+
+    class Meta:
+        model = ImportJob
+        fields = ('file',)
+
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        header = file.read(len(self.SQLITE_HEADER))
+        file.seek(0)
+        if header != self.SQLITE_HEADER:
+            raise forms.ValidationError(
+                _('The file is not a SQLite database.')
+            )
+        return file
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """Upload of SQLite catalogs imported by background processes.
+
+    A job can not be changed, its page shows the progress polled from
+    the status URL.
+    """
+
+    form = ImportJobForm
+    list_display = ('__str__', 'status', 'created', 'started', 'finished')
+    list_filter = ('status',)
+    actions = ('import_again',)
+
+    def get_fields(self, request, obj=None):
+        if obj is None:
+            return ('file',)
+        return ('file', 'status', 'started', 'finished', 'error')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        start_import(obj)
+
+    def response_add(self, request, obj, post_url_continue=None):
+        # the page of the job shows its progress
+        return HttpResponseRedirect(
+            reverse('admin:movies_importjob_change', args=(obj.pk,))
+        )
+
+    def get_urls(self):
+        return [
+            path(
+                '<path:object_id>/status/',
+                self.admin_site.admin_view(self.status_view),
+                name='movies_importjob_status',
+            ),
+            *super().get_urls(),
+        ]
+
+    def status_view(self, request, object_id):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        job = get_object_or_404(ImportJob, pk=object_id)
+        return JsonResponse(
+            {
+                'status': job.status,
+                'status_display': job.get_status_display(),
+                'finished': job.status
+                in (ImportStatus.DONE, ImportStatus.FAILED),
+                'error': job.error,
+                'stats': job.stats,
+            }
+        )
+
+    @admin.action(
+        description=_('Import selected files again'), permissions=('add',)
+    )
+    def import_again(self, request, queryset):
+        for job in queryset:
+            # a stale job was lost with the process running it
+            if job.status == ImportStatus.RUNNING and not is_stale(job):
+                continue
+            job.status = ImportStatus.PENDING
+            job.save(update_fields=('status',))
+            start_import(job)
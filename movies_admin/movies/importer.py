@@ -0,0 +1,188 @@
+"""Background import of uploaded SQLite catalogs.
+
+Jobs run in a pool of processes started by the web worker, so no
+broker is needed and the request only submits a job. Every gunicorn
+worker starts its own pool of IMPORT_WORKERS processes, and a restart
+of the worker takes its running jobs with it: they stop updating
+modified and become stale, see is_stale. Loading reuses
+dataimporter of sqlite_to_postgres, found at settings.IMPORTER_PATH.
+Models are imported inside functions: pool processes are spawned
+clean and import this module before Django is set up.
+"""
+import logging
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def setup_worker(importer_path: str):
+    import django
+
+    sys.path.insert(0, importer_path)
+    django.setup()
+
+
+def executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawned processes do not inherit connections of the parent
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMPORT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=setup_worker,
+                initargs=(settings.IMPORTER_PATH,),
+            )
+        return _executor
+
+
+def is_stale(job) -> bool:
+    """Whether the job is running but its process stopped reporting."""
+    from django.utils import timezone
+
+    from .models import ImportStatus
+
+    timeout = timedelta(seconds=settings.IMPORT_STALE_TIMEOUT)
+    return (
+        job.status == ImportStatus.RUNNING
+        and job.modified < timezone.now() - timeout
+    )
+
+
+def start_import(job):
+    """Submit the job once the transaction which saved it is committed."""
+    from django.db import transaction
+
+    job_id = str(job.pk)
+    transaction.on_commit(lambda: executor().submit(run_import, job_id))
+
+
+@contextmanager
+def progress_reporter(job_id: str, stats, interval: float):
+    """Save stats of the running import to the job every interval.
+
+    The reporter thread has its own database connection, so updates
+    are committed while the import transaction is open. modified is
+    the heartbeat of the job, a running job not updated for
+    IMPORT_STALE_TIMEOUT is lost.
+    """
+    from django.db import connection
+    from django.utils import timezone
+
+    from .models import ImportJob
+
+    stop = threading.Event()
+
+    def report():
+        try:
+            while not stop.wait(interval):
+                ImportJob.objects.filter(pk=job_id).update(
+                    stats=stats.summary(), modified=timezone.now()
+                )
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=report, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def load_catalog(path: str, stats):
+    """Load all tables of the SQLite catalog in dependency order.
+
+    Bad rows and orphan links are quarantined instead of failing
+    the job, duplicates of natural keys are remapped.
+    """
+    from django.db import connection
+    from psycopg2.extras import DictCursor
+
+    from dataimporter.keys import KeyIndex
+    from dataimporter.loader import load_table
+    from dataimporter.models import (
+        FilmWork,
+        Genre,
+        GenreFilmWork,
+        Person,
+        PersonFilmWork,
+    )
+    from dataimporter.postgres_saver import PostgresSaver, pg_conn_context
+    from dataimporter.sqlite_extractor import (
+        SQLiteExtractor,
+        sqlite_conn_context,
+    )
+
+    batch_size = settings.IMPORT_BATCH_SIZE
+    with sqlite_conn_context(path, read_only=True) as sqlite_conn:
+        with pg_conn_context(
+            connection.get_connection_params(), cursor_factory=DictCursor
+        ) as pg_conn:
+            # jobs are small, counts of inserted rows show their progress
+            saver = PostgresSaver(
+                pg_conn, stats=stats, quarantine=True, count_inserted=True
+            )
+            extractor = SQLiteExtractor(sqlite_conn, stats)
+            key_index = KeyIndex(sqlite_conn, pg_conn, stats)
+            # the same order of tables as in load_data.py
+            tables = (Genre, Person, FilmWork, PersonFilmWork, GenreFilmWork)
+            for model in tables:
+                load_table(
+                    extractor,
+                    saver,
+                    model,
+                    batch_size=batch_size,
+                    commit_rows=batch_size,
+                    key_index=key_index,
+                )
+
+
+def run_import(job_id: str):
+    """Run the import job in a pool process and record its outcome."""
+    from django.utils import timezone
+
+    from dataimporter.stats import ImportStats
+
+    from .models import ImportJob, ImportStatus
+
+    job = ImportJob.objects.get(pk=job_id)
+    job.status = ImportStatus.RUNNING
+    job.started = timezone.now()
+    job.finished = None
+    job.error = ''
+    job.stats = {}
+    job.save(
+        update_fields=(
+            'status', 'started', 'finished', 'error', 'stats', 'modified'
+        )
+    )
+
+    stats = ImportStats()
+    try:
+        with progress_reporter(
+            job_id, stats, settings.IMPORT_PROGRESS_INTERVAL
+        ):
+            load_catalog(job.file.path, stats)
+    except Exception as error:
+        logger.exception('Import %s failed', job_id)
+        job.status = ImportStatus.FAILED
+        job.error = f'{type(error).__name__}: {error}'
+    else:
+        job.status = ImportStatus.DONE
+    job.stats = stats.summary()
+    job.finished = timezone.now()
+    job.save(
+        update_fields=('status', 'error', 'stats', 'finished', 'modified')
+    )
@@ -0,0 +1,30 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Admin search filters by UPPER(column::text) LIKE UPPER('%term%'),
+# so the indexes are built on the same expressions.
+SEARCH_INDEXES = (
+    ('film_work_title_trgm_idx', 'film_work', 'title'),
+    ('film_work_description_trgm_idx', 'film_work', 'description'),
+    ('person_full_name_trgm_idx', 'person', 'full_name'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_add_filmwork_rating_default'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+    ] + [
+        migrations.RunSQL(
+            sql=(
+                f'CREATE INDEX IF NOT EXISTS {name} ON content.{table} '
+                f'USING gin ((UPPER({column}::text)) gin_trgm_ops);'
+            ),
+            reverse_sql=f'DROP INDEX IF EXISTS content.{name};',
+        )
+        for name, table, column in SEARCH_INDEXES
+    ]
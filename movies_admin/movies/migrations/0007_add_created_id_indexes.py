@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+# The DDL creates the same indexes, so on a schema built from it they
+# already exist and are created only where they are missing.
+CREATED_ID_INDEXES = (
+    ('filmwork', 'film_work_created_id_idx', 'film_work'),
+    ('person', 'person_created_id_idx', 'person'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_add_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=(
+                        f'CREATE INDEX IF NOT EXISTS {name} '
+                        f'ON content.{table} (created, id);'
+                    ),
+                    reverse_sql=f'DROP INDEX IF EXISTS content.{name};',
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name=model_name,
+                    index=models.Index(fields=['created', 'id'], name=name),
+                ),
+            ],
+        )
+        for model_name, name, table in CREATED_ID_INDEXES
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations, models
+
+# Tables created by the DDL, before the initial migration was applied,
+# have no indexes on the foreign keys Django would have made, so they
+# are added only where no index starts with the column.
+LINK_INDEXES = (
+    ('person_film_work_person_id_idx', 'person_film_work', 'person_id'),
+    ('genre_film_work_genre_id_idx', 'genre_film_work', 'genre_id'),
+)
+
+CREATE_IF_NOT_INDEXED = """
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_index i
+        JOIN pg_attribute a
+            ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = 'content.{table}'::regclass
+            AND a.attname = '{column}'
+    ) THEN
+        CREATE INDEX {name} ON content.{table} ({column});
+    END IF;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_add_created_id_indexes'),
+    ]
+
+    operations = [
+        # the DDL creates the same index, see 0007
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=(
+                        'CREATE INDEX IF NOT EXISTS film_work_type_idx '
+                        'ON content.film_work (type);'
+                    ),
+                    reverse_sql=(
+                        'DROP INDEX IF EXISTS content.film_work_type_idx;'
+                    ),
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='filmwork',
+                    index=models.Index(
+                        fields=['type'], name='film_work_type_idx'
+                    ),
+                ),
+            ],
+        ),
+    ] + [
+        migrations.RunSQL(
+            sql=CREATE_IF_NOT_INDEXED.format(
+                name=name, table=table, column=column
+            ),
+            reverse_sql=f'DROP INDEX IF EXISTS content.{name};',
+        )
+        for name, table, column in LINK_INDEXES
+    ]
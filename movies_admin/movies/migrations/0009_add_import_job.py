@@ -0,0 +1,32 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_add_filter_and_link_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='modified')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file', models.FileField(upload_to='imports/', verbose_name='SQLite file')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='pending', max_length=16, verbose_name='status')),
+                ('stats', models.JSONField(blank=True, default=dict, verbose_name='statistics')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='started')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='finished')),
+            ],
+            options={
+                'verbose_name': 'import',
+                'verbose_name_plural': 'imports',
+                'db_table': 'content"."import_job',
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+import os
+
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -12,6 +14,15 @@ class Person(UUIDMixin, TimeStampedMixin):
         db_table = "content\".\"person"
         verbose_name = _('person')
         verbose_name_plural = _('people')
+        # keyset pages of the admin go in this order
+        indexes = [
+            models.Index(
+                fields=['created', 'id'], name='person_created_id_idx'
+            )
+        ]
+
+    def __str__(self):
+        return self.full_name
 
 
 class Genre(UUIDMixin, TimeStampedMixin):
@@ -52,6 +63,13 @@ class Filmwork(UUIDMixin, TimeStampedMixin):
         db_table = "content\".\"film_work"
         verbose_name = _('film work')
         verbose_name_plural = _('film works')
+        indexes = [
+            models.Index(
+                fields=['created', 'id'], name='film_work_created_id_idx'
+            ),
+            # list filter of the admin
+            models.Index(fields=['type'], name='film_work_type_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['title', 'creation_date'], name='unique_filmwork'
@@ -101,3 +119,33 @@ class PersonFilmwork(UUIDMixin):
                 name='unique_filmwork_person',
             )
         ]
+
+
+class ImportStatus(models.TextChoices):
+    PENDING = 'pending', _('pending')
+    RUNNING = 'running', _('running')
+    DONE = 'done', _('done')
+    FAILED = 'failed', _('failed')
+
+
+class ImportJob(UUIDMixin, TimeStampedMixin):
+    file = models.FileField(_('SQLite file'), upload_to='imports/')
+    status = models.CharField(
+        _('status'),
+        choices=ImportStatus.choices,
+        default=ImportStatus.PENDING,
+        max_length=16,
+    )
+    # ImportStats.summary() of the import, updated while it runs
+    stats = models.JSONField(_('statistics'), default=dict, blank=True)
+    error = models.TextField(_('error'), blank=True)
+    started = models.DateTimeField(_('started'), null=True, blank=True)
+    finished = models.DateTimeField(_('finished'), null=True, blank=True)
+
+    class Meta:
+        db_table = "content\".\"import_job"
+        verbose_name = _('import')
+        verbose_name_plural = _('imports')
+
+    def __str__(self):
+        return os.path.basename(self.file.name)
@@ -0,0 +1,164 @@
+import json
+import uuid
+from datetime import datetime
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+
+def estimated_count(queryset):
+    """Return the planner estimate of rows, None if it is not available."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+        else:
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        (result,) = cursor.fetchone()
+    if isinstance(result, int):
+        return result
+    if isinstance(result, str):
+        result = json.loads(result)
+    return int(result[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator which does not count rows of large tables.
+
+    Counts above ESTIMATE_THRESHOLD are taken from the table statistics
+    or the query plan, so they are approximate.
+    """
+
+    ESTIMATE_THRESHOLD = 10_000
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < self.ESTIMATE_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class KeysetChangeList(ChangeList):
+    """Changelist paging by the last shown row instead of OFFSET.
+
+    In the default order, newest first, the next page holds the rows
+    following the (created, id) of the last row on this page, so any
+    page costs an index scan of one page. Rows imported without created
+    come first, as in a backward scan of the index, and their cursors
+    have an empty created. Sorting by a column falls back to numbered
+    pages.
+    """
+
+    keyset_ordering = (F('created').desc(nulls_first=True), '-id')
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    @property
+    def keyset(self):
+        return ORDER_VAR not in self.params and not self.show_all
+
+    def get_ordering(self, request, queryset):
+        if self.keyset:
+            return list(self.keyset_ordering)
+        return super().get_ordering(request, queryset)
+
+    def get_results(self, request):
+        super().get_results(request)
+        if not self.keyset:
+            return
+        after = self.params.get(AFTER_VAR)
+        before = self.params.get(BEFORE_VAR)
+        queryset = self.queryset
+        if after:
+            queryset = queryset.filter(self.after_cursor(after))
+        elif before:
+            queryset = queryset.filter(self.before_cursor(before)).reverse()
+        rows = list(queryset[:self.list_per_page + 1])
+        has_more = len(rows) > self.list_per_page
+        rows = rows[:self.list_per_page]
+        if before:
+            rows.reverse()
+
+        has_next = bool(before) or has_more
+        has_previous = bool(after) or (bool(before) and has_more)
+        self.result_list = rows
+        # numbered pages are replaced by links to the neighbour pages
+        self.multi_page = False
+        self.next_url = self.previous_url = self.first_url = None
+        if has_next and rows:
+            self.next_url = self.get_query_string(
+                {AFTER_VAR: self.make_cursor(rows[-1])}, [BEFORE_VAR]
+            )
+        if has_previous and rows:
+            self.previous_url = self.get_query_string(
+                {BEFORE_VAR: self.make_cursor(rows[0])}, [AFTER_VAR]
+            )
+        if has_previous:
+            self.first_url = self.get_query_string(
+                remove=[AFTER_VAR, BEFORE_VAR]
+            )
+
+    def after_cursor(self, cursor: str) -> Q:
+        """Return the filter of rows shown after the cursor row."""
+        created, pk = self.parse_cursor(cursor)
+        if created is None:
+            return Q(created__isnull=True, pk__lt=pk) | Q(
+                created__isnull=False
+            )
+        return Q(created__lt=created) | Q(created=created, pk__lt=pk)
+
+    def before_cursor(self, cursor: str) -> Q:
+        """Return the filter of rows shown before the cursor row."""
+        created, pk = self.parse_cursor(cursor)
+        if created is None:
+            return Q(created__isnull=True, pk__gt=pk)
+        return (
+            Q(created__isnull=True)
+            | Q(created__gt=created)
+            | Q(created=created, pk__gt=pk)
+        )
+
+    @staticmethod
+    def make_cursor(obj) -> str:
+        created = obj.created.isoformat() if obj.created else ''
+        return f'{created}_{obj.pk}'
+
+    @staticmethod
+    def parse_cursor(cursor: str):
+        try:
+            created, pk = cursor.rsplit('_', 1)
+            if not created:
+                return None, uuid.UUID(pk)
+            return datetime.fromisoformat(created), uuid.UUID(pk)
+        except ValueError:
+            raise IncorrectLookupParameters
+
+
+class KeysetPaginationMixin:
+    """Admin with keyset pages and estimated counts for large tables."""
+
+    paginator = EstimatedCountPaginator
+    # the total would be counted by one more full scan
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
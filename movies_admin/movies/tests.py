@@ -0,0 +1,164 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
+
+from config.db_backends.postgresql.base import ConnectionPool
+
+from .models import (
+    FilmType,
+    Filmwork,
+    Genre,
+    GenreFilmwork,
+    ImportJob,
+    ImportStatus,
+    Person,
+    PersonFilmwork,
+    Role,
+)
+from .pagination import KeysetChangeList
+
+
+class FilmworkAdminQueriesTest(TestCase):
+    """Admin pages of film works make no queries per shown row.
+
+    Counts differ between database backends, e.g. by the estimate of
+    rows on Postgres, so every page is compared with itself before and
+    after rows are added.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.film_work = Filmwork.objects.create(
+            title='Film', type=FilmType.MALE
+        )
+        cls.add_links(cls.film_work, 0, 1)
+
+    @staticmethod
+    def add_links(film_work, start, stop):
+        for i in range(start, stop):
+            person = Person.objects.create(full_name=f'Person {i}')
+            PersonFilmwork.objects.create(
+                film_work=film_work, person=person, role=Role.ACTOR
+            )
+            genre = Genre.objects.create(name=f'Genre {i}')
+            GenreFilmwork.objects.create(film_work=film_work, genre=genre)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def count_queries(self, url) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_change_form_queries_do_not_grow_with_inlines(self):
+        url = reverse(
+            'admin:movies_filmwork_change', args=(self.film_work.pk,)
+        )
+        self.client.get(url)
+        queries = self.count_queries(url)
+
+        self.add_links(self.film_work, 1, 20)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertContains(response, 'Person 19')
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:movies_filmwork_changelist')
+        self.client.get(url)
+        queries = self.count_queries(url)
+
+        for i in range(20):
+            Filmwork.objects.create(title=f'Film {i}', type=FilmType.MALE)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertContains(response, 'Film 19')
+
+
+class KeysetCursorTest(SimpleTestCase):
+    def test_cursor_of_row_without_created(self):
+        row = Person(full_name='Person', created=None)
+
+        cursor = KeysetChangeList.make_cursor(row)
+
+        self.assertEqual(cursor, f'_{row.pk}')
+        self.assertEqual(KeysetChangeList.parse_cursor(cursor), (None, row.pk))
+
+
+def fake_connect(*args, **kwargs):
+    connection = mock.Mock(closed=False)
+    connection.info.transaction_status = TRANSACTION_STATUS_IDLE
+    return connection
+
+
+@mock.patch('psycopg2.connect', fake_connect)
+class ConnectionPoolTest(SimpleTestCase):
+    def test_returned_connection_is_reused(self):
+        pool = ConnectionPool(2, 1)
+
+        first = pool.getconn()
+        pool.putconn(first)
+
+        self.assertIs(pool.getconn(), first)
+        first.close.assert_not_called()
+
+    def test_exhausted_pool_waits_for_a_connection(self):
+        pool = ConnectionPool(1, 5)
+        first = pool.getconn()
+        threading.Timer(0.1, pool.putconn, (first,)).start()
+
+        self.assertIs(pool.getconn(), first)
+
+    def test_exhausted_pool_raises_after_timeout(self):
+        pool = ConnectionPool(1, 0.01)
+        pool.getconn()
+
+        with self.assertRaises(PoolError):
+            pool.getconn()
+
+
+class ImportAgainTest(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser(
+                'admin', 'admin@example.com', 'password'
+            )
+        )
+
+    def create_job(self, status, modified):
+        job = ImportJob.objects.create(file='imports/movies.db', status=status)
+        ImportJob.objects.filter(pk=job.pk).update(modified=modified)
+        return job
+
+    @mock.patch('movies.admin.start_import')
+    def test_only_stale_running_jobs_are_started_again(self, start_import):
+        now = timezone.now()
+        running = self.create_job(ImportStatus.RUNNING, now)
+        stale = self.create_job(ImportStatus.RUNNING, now - timedelta(hours=1))
+        failed = self.create_job(ImportStatus.FAILED, now - timedelta(hours=1))
+
+        self.client.post(
+            reverse('admin:movies_importjob_changelist'),
+            {
+                'action': 'import_again',
+                '_selected_action': [running.pk, stale.pk, failed.pk],
+            },
+        )
+
+        started = {call.args[0].pk for call in start_import.call_args_list}
+        self.assertEqual(started, {stale.pk, failed.pk})
+        running.refresh_from_db()
+        self.assertEqual(running.status, ImportStatus.RUNNING)
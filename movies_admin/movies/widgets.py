@@ -0,0 +1,31 @@
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Autocomplete which renders an already loaded selected object.
+
+    AutocompleteSelect queries the selected object for every form, so
+    an inline makes a query per row. When the form gives the object
+    loaded with its row, the option is built from it instead.
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.selected is None or list(map(str, value)) != [
+            str(self.selected.pk)
+        ]:
+            return super().optgroups(name, value, attr)
+        default = (None, [], 0)
+        if not self.is_required:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        default[1].append(
+            self.create_option(
+                name,
+                self.selected.pk,
+                self.choices.field.label_from_instance(self.selected),
+                True,
+                len(default[1]),
+            )
+        )
+        return [default]
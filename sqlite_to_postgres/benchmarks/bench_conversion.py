@@ -0,0 +1,71 @@
+"""Micro-benchmark of SQLite row conversion before saving to Postgres.
+
+Compares the dataclass path (transform -> dataclass -> asdict) with
+the precompiled tuple converter on an in-memory film_work table:
+
+    python benchmarks/bench_conversion.py --rows 200000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import asdict, fields
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from fixtures import create_schema, fill_film_work
+
+from dataimporter.converters import compile_converter
+from dataimporter.models import FilmWork
+from dataimporter.sqlite_extractor import SQLiteExtractor
+
+
+def build_source(rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    create_schema(conn)
+    fill_film_work(conn, rows)
+    return conn
+
+
+def dataclass_path(extractor: SQLiteExtractor, batch_size: int) -> int:
+    count = 0
+    for batch in extractor.extract(FilmWork, batch_size):
+        count += len([asdict(obj) for obj in batch])
+    return count
+
+
+def converter_path(extractor: SQLiteExtractor, batch_size: int) -> int:
+    convert = compile_converter(
+        SQLiteExtractor.source_columns(FilmWork),
+        [field.name for field in fields(FilmWork)],
+    )
+    key_range = extractor.split(FilmWork, 1)[0]
+    count = 0
+    for _, batch in extractor.extract_range(
+        FilmWork, key_range, batch_size, convert
+    ):
+        count += len(batch)
+    return count
+
+
+def measure(name, func, *args):
+    started = time.perf_counter()
+    count = func(*args)
+    elapsed = time.perf_counter() - started
+    print(f'{name:<12} {count:>10} rows {count / elapsed:>14,.0f} rows/s')
+    return count / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    extractor = SQLiteExtractor(build_source(args.rows))
+    slow = measure('dataclass', dataclass_path, extractor, args.batch_size)
+    fast = measure('converter', converter_path, extractor, args.batch_size)
+    print(f'speedup: x{fast / slow:.1f}')
@@ -0,0 +1,199 @@
+"""End-to-end benchmark of load_from_sqlite on a synthetic catalog.
+
+Imports a generated source into the Postgres of config.DATABASE and
+stores rows/sec, peak memory and per-table times under the current
+git commit, so runs of different commits can be compared:
+
+    python benchmarks/bench_import.py --scale medium --truncate
+    python benchmarks/bench_import.py --scale medium --truncate \
+        --baseline 1a2b3c4
+
+The target tables must be empty, --truncate empties them first.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+import config
+from fixtures import SCALES, build_catalog
+from load_data import SAVERS, TABLES, load_from_sqlite
+from psycopg2.extras import DictCursor
+
+from dataimporter.indexes import tables_are_empty
+from dataimporter.postgres_saver import PostgresSaver, pg_conn_context
+from dataimporter.sqlite_extractor import sqlite_conn_context
+from dataimporter.stats import ImportStats
+
+BENCH_DIR = os.path.join(BASE_DIR, 'benchmarks')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+# generated sources are reused by later runs of the same scale and seed
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+
+
+def git_commit() -> str:
+    commit = subprocess.run(
+        ['git', 'rev-parse', '--short', 'HEAD'],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+    changes = subprocess.run(
+        ['git', 'status', '--porcelain', '--untracked-files=no'],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return f'{commit}-dirty' if changes else commit
+
+
+def source_path(scale: str, seed: int) -> str:
+    path = os.path.join(DATA_DIR, f'{scale}-{seed}.sqlite')
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f'Generating {scale} catalog into {path}')
+        build_catalog(path + '.tmp', scale, seed)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def prepare_target(truncate: bool):
+    tables = [PostgresSaver.model_2_table_name(table) for table in TABLES]
+    with pg_conn_context(config.DATABASE, cursor_factory=DictCursor) as conn:
+        curs = conn.cursor()
+        if truncate:
+            curs.execute(
+                'TRUNCATE '
+                + ', '.join(f'content.{table}' for table in tables)
+            )
+        elif not tables_are_empty(curs, tables):
+            sys.exit('Target tables are not empty, use --truncate')
+
+
+def run_import(source: str, saver: str, batch_size: int) -> dict:
+    stats = ImportStats()
+    started = time.perf_counter()
+    with sqlite_conn_context(
+        source, read_only=True, **config.SQLITE_OPTIONS
+    ) as sqlite_conn, pg_conn_context(
+        config.DATABASE, cursor_factory=DictCursor
+    ) as pg_conn:
+        load_from_sqlite(
+            sqlite_conn,
+            pg_conn,
+            SAVERS[saver],
+            stats=stats,
+            batch_size=batch_size,
+        )
+    seconds = time.perf_counter() - started
+    rows = sum(table.rows_read for table in stats.tables.values())
+    return {
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(rows / seconds),
+        # ru_maxrss is in KiB on Linux
+        'max_rss_mib': round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10, 1
+        ),
+        'tables': {
+            name: {
+                'rows': table.rows_read,
+                'seconds': round(
+                    table.fetch_seconds
+                    + table.convert_seconds
+                    + table.save_seconds,
+                    3,
+                ),
+            }
+            for name, table in stats.tables.items()
+        },
+    }
+
+
+def save_result(result: dict) -> str:
+    """Add the result to the file of its commit, one entry per setup."""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f'{result["commit"]}.json')
+    results = []
+    if os.path.exists(path):
+        with open(path) as f:
+            results = json.load(f)
+    results = [
+        other for other in results if setup_of(other) != setup_of(result)
+    ]
+    results.append(result)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return path
+
+
+def setup_of(result: dict) -> tuple:
+    return (
+        result['scale'],
+        result['seed'],
+        result['saver'],
+        result['batch_size'],
+    )
+
+
+def compare(result: dict, baseline: str):
+    path = os.path.join(RESULTS_DIR, f'{baseline}.json')
+    if not os.path.exists(path):
+        print(f'No results of {baseline}')
+        return
+    with open(path) as f:
+        previous = {setup_of(other): other for other in json.load(f)}
+    other = previous.get(setup_of(result))
+    if other is None:
+        print(f'{baseline} has no run with the same setup')
+        return
+    change = result['rows_per_second'] / other['rows_per_second'] - 1
+    print(
+        f'rows/s {other["rows_per_second"]} -> '
+        f'{result["rows_per_second"]} ({change:+.1%}) against {baseline}'
+    )
+
+
+def print_result(result: dict):
+    print(f'{"table":<18} {"rows":>12} {"seconds":>10}')
+    for name, table in result['tables'].items():
+        print(f'{name:<18} {table["rows"]:>12} {table["seconds"]:>10.3f}')
+    print(
+        f'{result["rows"]} rows in {result["seconds"]} s, '
+        f'{result["rows_per_second"]} rows/s, '
+        f'peak RSS {result["max_rss_mib"]} MiB'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--saver', choices=SAVERS, default='insert')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--truncate', action='store_true')
+    parser.add_argument('--baseline', help='commit to compare rows/s with')
+    args = parser.parse_args()
+
+    source = source_path(args.scale, args.seed)
+    prepare_target(args.truncate)
+    result = run_import(source, args.saver, args.batch_size)
+    result.update(
+        commit=git_commit(),
+        scale=args.scale,
+        seed=args.seed,
+        saver=args.saver,
+        batch_size=args.batch_size,
+    )
+    print_result(result)
+    print(f'Saved to {save_result(result)}')
+    if args.baseline:
+        compare(result, args.baseline)
@@ -0,0 +1,78 @@
+"""Memory benchmark of one large import batch of film_work rows.
+
+Every variant runs in a fresh process, which reports its peak RSS and
+the peak of Python allocations made while the batch is built:
+
+    python benchmarks/bench_memory.py --rows 500000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tracemalloc
+from dataclasses import field, fields, make_dataclass
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from bench_conversion import build_source
+
+from dataimporter.converters import compile_converter
+from dataimporter.models import FilmWork
+from dataimporter.sqlite_extractor import SQLiteExtractor
+
+# the same record type without __slots__, as the models were before
+DictFilmWork = make_dataclass(
+    'FilmWork',
+    [
+        (
+            f.name,
+            f.type,
+            field(default=f.default, default_factory=f.default_factory),
+        )
+        for f in fields(FilmWork)
+    ],
+    frozen=True,
+)
+
+
+def build_batch(variant: str, rows: int):
+    extractor = SQLiteExtractor(build_source(rows))
+    key_range = extractor.split(FilmWork, 1)[0]
+
+    tracemalloc.start()
+    if variant == 'tuples':
+        convert = compile_converter(
+            SQLiteExtractor.source_columns(FilmWork),
+            [f.name for f in fields(FilmWork)],
+        )
+        batch = next(
+            extractor.extract_range(FilmWork, key_range, rows, convert)
+        )
+    else:
+        model = FilmWork if variant == 'slots' else DictFilmWork
+        batch = next(extractor.extract_range(model, key_range, rows))
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB
+    return variant, len(batch[1]), traced_peak, max_rss
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500_000)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    print(f'{"variant":<8} {"rows":>10} {"batch MiB":>10} {"RSS MiB":>10}')
+    for variant in ('dict', 'slots', 'tuples'):
+        with context.Pool(1) as pool:
+            name, count, traced_peak, max_rss = pool.apply(
+                build_batch, (variant, args.rows)
+            )
+        print(
+            f'{name:<8} {count:>10} {traced_peak / 2 ** 20:>10.1f} '
+            f'{max_rss / 2 ** 10:>10.1f}'
+        )
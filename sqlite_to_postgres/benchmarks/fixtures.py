@@ -0,0 +1,194 @@
+"""Synthetic SQLite sources with the schema read by SQLiteExtractor.
+
+A whole catalog of a given scale can be written to a file:
+
+    python benchmarks/fixtures.py --scale medium --output /tmp/medium.sqlite
+"""
+import argparse
+import itertools
+import random
+import sqlite3
+import uuid
+from datetime import date, timedelta
+from typing import Iterable, Iterator
+
+# number of person_film_work and genre_film_work rows
+SCALES = {
+    'tiny': 10_000,
+    'small': 100_000,
+    'medium': 1_000_000,
+    'large': 10_000_000,
+    'huge': 50_000_000,
+}
+# share of rows with NULL in the column, as in the original source
+DESCRIPTION_NULLS = 0.3
+RATING_NULLS = 0.2
+CREATION_DATE_NULLS = 0.5
+# links of a film work; films, persons and genres follow from the scale
+PERSONS_PER_FILM = 8
+GENRES_PER_FILM = 2
+FILMS_PER_PERSON = 2
+GENRES = 40
+ROLES = ('actor', 'director', 'writer')
+CHUNK_SIZE = 100_000
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS genre '
+    '(id TEXT PRIMARY KEY, name TEXT, description TEXT)',
+    'CREATE TABLE IF NOT EXISTS person (id TEXT PRIMARY KEY, full_name TEXT)',
+    'CREATE TABLE IF NOT EXISTS film_work (id TEXT PRIMARY KEY, title TEXT, '
+    'description TEXT, creation_date TEXT, file_path TEXT, rating REAL, '
+    'type TEXT)',
+    'CREATE TABLE IF NOT EXISTS person_film_work (id TEXT PRIMARY KEY, '
+    'film_work_id TEXT, person_id TEXT, role TEXT)',
+    'CREATE TABLE IF NOT EXISTS genre_film_work (id TEXT PRIMARY KEY, '
+    'film_work_id TEXT, genre_id TEXT)',
+)
+
+
+def create_schema(conn: sqlite3.Connection):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def fill_film_work(conn: sqlite3.Connection, rows: int, seed: int = 0):
+    """Insert film works, 30% without description and 20% without rating."""
+    rnd = random.Random(seed)
+    conn.executemany(
+        'INSERT INTO film_work VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (
+            (
+                str(uuid.UUID(int=rnd.getrandbits(128), version=4)),
+                f'Film {i}',
+                None
+                if rnd.random() < DESCRIPTION_NULLS
+                else 'Some description ' * 10,
+                None,
+                None,
+                None
+                if rnd.random() < RATING_NULLS
+                else round(rnd.uniform(0, 10), 1),
+                rnd.choice(('movie', 'tv_show')),
+            )
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+
+
+def entity_id(kind: str, number: int) -> str:
+    """Stable id, so links can be built without keeping ids in memory."""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f'{kind}{number}'))
+
+
+def insert_chunked(conn: sqlite3.Connection, query: str, rows: Iterable):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        conn.executemany(query, chunk)
+        conn.commit()
+
+
+def film_works(rnd: random.Random, films: int) -> Iterator:
+    first_day = date(1920, 1, 1)
+    for i in range(films):
+        yield (
+            entity_id('film_work', i),
+            f'Film {i}',
+            None
+            if rnd.random() < DESCRIPTION_NULLS
+            else f'Description of film {i}. ' * rnd.randint(1, 20),
+            None
+            if rnd.random() < CREATION_DATE_NULLS
+            else str(first_day + timedelta(days=rnd.randrange(36_500))),
+            None,
+            None
+            if rnd.random() < RATING_NULLS
+            else round(rnd.uniform(0, 10), 1),
+            rnd.choice(('movie', 'tv_show')),
+        )
+
+
+def person_links(rnd: random.Random, films: int, persons: int) -> Iterator:
+    for film in range(films):
+        for person in rnd.sample(range(persons), PERSONS_PER_FILM):
+            yield (
+                str(uuid.UUID(int=rnd.getrandbits(128), version=4)),
+                entity_id('film_work', film),
+                entity_id('person', person),
+                rnd.choice(ROLES),
+            )
+
+
+def genre_links(rnd: random.Random, films: int) -> Iterator:
+    for film in range(films):
+        for genre in rnd.sample(range(GENRES), GENRES_PER_FILM):
+            yield (
+                str(uuid.UUID(int=rnd.getrandbits(128), version=4)),
+                entity_id('film_work', film),
+                entity_id('genre', genre),
+            )
+
+
+def generate_catalog(conn: sqlite3.Connection, links: int, seed: int = 0):
+    """Fill all tables with about the given number of link rows."""
+    rnd = random.Random(seed)
+    films = max(links // (PERSONS_PER_FILM + GENRES_PER_FILM), 1)
+    persons = max(
+        films * PERSONS_PER_FILM // FILMS_PER_PERSON, PERSONS_PER_FILM
+    )
+    create_schema(conn)
+    insert_chunked(
+        conn,
+        'INSERT INTO genre VALUES (?, ?, ?)',
+        (
+            (
+                entity_id('genre', i),
+                f'Genre {i}',
+                None if rnd.random() < DESCRIPTION_NULLS else f'Genre {i}',
+            )
+            for i in range(GENRES)
+        ),
+    )
+    insert_chunked(
+        conn,
+        'INSERT INTO person VALUES (?, ?)',
+        ((entity_id('person', i), f'Person {i}') for i in range(persons)),
+    )
+    insert_chunked(
+        conn,
+        'INSERT INTO film_work VALUES (?, ?, ?, ?, ?, ?, ?)',
+        film_works(rnd, films),
+    )
+    insert_chunked(
+        conn,
+        'INSERT INTO person_film_work VALUES (?, ?, ?, ?)',
+        person_links(rnd, films, persons),
+    )
+    insert_chunked(
+        conn,
+        'INSERT INTO genre_film_work VALUES (?, ?, ?)',
+        genre_links(rnd, films),
+    )
+
+
+def build_catalog(path: str, scale: str, seed: int = 0):
+    conn = sqlite3.connect(path)
+    # the file is disposable, a crash simply means generating it again
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    try:
+        generate_catalog(conn, SCALES[scale], seed)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+    build_catalog(args.output, args.scale, args.seed)
@@ -6,10 +6,71 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 DB_CONFIG_PATH = os.path.join(BASE_DIR, 'movies_admin/config/.env')
 
+load_dotenv(DB_CONFIG_PATH)
+
 # SQLite source db from where data is imported to main PostgreSQL
-SQLITE_DB = os.path.join(BASE_DIR, 'sqlite_to_postgres/db.sqlite')
+SQLITE_DB = os.getenv(
+    'SQLITE_DB', default=os.path.join(BASE_DIR, 'sqlite_to_postgres/db.sqlite')
+)
 
-load_dotenv(DB_CONFIG_PATH)
+# Progress of the last unfinished import, used to resume it after a failure
+IMPORT_JOURNAL = os.getenv(
+    'IMPORT_JOURNAL',
+    default=os.path.join(BASE_DIR, 'sqlite_to_postgres/import_journal.db'),
+)
+
+# PRAGMAs of the read-only SQLite source tuned for large files
+SQLITE_READ_PROFILE = {
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', default=2**30)),
+    # negative value is in KiB, i.e. 256 MiB of page cache
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', default=-262144)),
+    'temp_store': 'MEMORY',
+    'query_only': 'ON',
+}
+
+# Set when the source file is known not to change during import
+SQLITE_IMMUTABLE = (
+    os.getenv('SQLITE_IMMUTABLE', default='false').lower() == 'true'
+)
+
+# Keyword arguments of sqlite_conn_context for reading the source
+SQLITE_OPTIONS = (
+    {'profile': SQLITE_READ_PROFILE, 'immutable': SQLITE_IMMUTABLE}
+    if os.getenv('SQLITE_READ_TUNING', default='true').lower() == 'true'
+    else {}
+)
+
+# Number of tables imported at the same time, each in its own process
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', default=1))
+
+# Number of rowid ranges every table is split into for parallel import
+IMPORT_PARTITIONS = int(os.getenv('IMPORT_PARTITIONS', default=1))
+
+# Rows per import batch, the initial value with --adaptive-batch
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', default=100))
+
+# Adaptive batches are sized to be saved in about this time...
+IMPORT_BATCH_TARGET_SECONDS = float(
+    os.getenv('IMPORT_BATCH_TARGET_SECONDS', default=0.5)
+)
+
+# ...while values of one batch stay below this size
+IMPORT_BATCH_MAX_BYTES = int(
+    os.getenv('IMPORT_BATCH_MAX_BYTES', default=64 * 2**20)
+)
+
+# Rows saved between commits, 0 commits every batch
+IMPORT_COMMIT_ROWS = int(os.getenv('IMPORT_COMMIT_ROWS', default=0))
+
+# Indexes rebuilt at the same time after a load with --defer-indexes
+IMPORT_INDEX_WORKERS = int(
+    os.getenv('IMPORT_INDEX_WORKERS', default=min(4, os.cpu_count() or 1))
+)
+
+# Memory for every index rebuilt after a load with --defer-indexes
+IMPORT_MAINTENANCE_WORK_MEM = os.getenv(
+    'IMPORT_MAINTENANCE_WORK_MEM', default='1GB'
+)
 
 DATABASE = {
     'dbname': os.getenv('DB_NAME'),
@@ -0,0 +1,172 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, Iterable, Optional
+
+from psycopg2.extras import DictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+from .loader import build_converter
+from .postgres_saver import PostgresSaver
+from .sqlite_extractor import SQLiteExtractor, sqlite_conn_context
+from .stats import ImportStats
+
+
+class AsyncImporter:
+    """Import pipeline overlapping SQLite reads with Postgres writes.
+
+    For every table a producer reads batches from SQLite in a thread and
+    puts them to a bounded queue, so it waits when Postgres lags behind
+    by queue_depth batches. Consumer tasks take batches from the queue
+    and write them over connections of a pool, each batch in its own
+    transaction. psycopg2 is blocking, so every consumer writes in
+    a thread of its own, which also creates its connection and saver.
+    """
+
+    def __init__(
+        self,
+        sqlite_db: str,
+        dsn: Dict,
+        saver_class=PostgresSaver,
+        consumers: int = 2,
+        queue_depth: int = 4,
+        batch_size: int = 100,
+        sqlite_options: Optional[Dict] = None,
+        stats: Optional[ImportStats] = None,
+    ):
+        self.sqlite_db = sqlite_db
+        self.dsn = dsn
+        self.saver_class = saver_class
+        self.consumers = consumers
+        self.queue_depth = queue_depth
+        self.batch_size = batch_size
+        self.sqlite_options = sqlite_options or {}
+        self.stats = stats or ImportStats()
+
+    async def run(self, models: Iterable):
+        """Import tables one after another in the given order."""
+        # psycopg2 pools keep only minconn returned connections open,
+        # so consumers of the next table reuse all of them
+        self.pool = ThreadedConnectionPool(
+            self.consumers,
+            self.consumers,
+            **self.dsn,
+            cursor_factory=DictCursor,
+        )
+        self.reader = ThreadPoolExecutor(max_workers=1)
+        self.writers = []
+        try:
+            for model in models:
+                await self.load_table(model)
+        finally:
+            self.reader.shutdown()
+            # writes of cancelled consumers finish before the pool closes
+            for writer in self.writers:
+                writer.shutdown()
+            self.pool.closeall()
+
+    async def load_table(self, model):
+        loop = asyncio.get_running_loop()
+        # the converter is built before the reader starts the table
+        convert = await loop.run_in_executor(
+            self.reader, self.table_converter, model
+        )
+        queue = asyncio.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+        producer = loop.run_in_executor(
+            self.reader, self.produce, loop, queue, model, convert, stop
+        )
+        consumers = [
+            asyncio.create_task(self.consume(queue, model))
+            for _ in range(self.consumers)
+        ]
+
+        await asyncio.wait(
+            [producer, *consumers], return_when=asyncio.FIRST_EXCEPTION
+        )
+        if not producer.done():  # a consumer failed, stop reading
+            stop.set()
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.sleep(0.01)
+
+        errors = [
+            future.exception()
+            for future in (producer, *consumers)
+            if future.done() and not future.cancelled() and future.exception()
+        ]
+        if errors:
+            for task in consumers:
+                task.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+            raise errors[0]
+
+    def table_converter(self, model):
+        conn = self.pool.getconn()
+        try:
+            return build_converter(self.saver_class(conn), model)
+        finally:
+            self.pool.putconn(conn)
+
+    def produce(self, loop, queue, model, convert, stop: threading.Event):
+        """Read batches of the table and put them to the queue.
+
+        None is put for every consumer at the end of the table.
+        """
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        with sqlite_conn_context(
+            self.sqlite_db, read_only=True, **self.sqlite_options
+        ) as conn:
+            extractor = SQLiteExtractor(conn, self.stats)
+            for key_range in extractor.split(model, 1):
+                for _, batch in extractor.extract_range(
+                    model, key_range, self.batch_size, convert
+                ):
+                    if stop.is_set():
+                        return
+                    put(batch)
+        for _ in range(self.consumers):
+            put(None)
+
+    async def consume(self, queue, model):
+        """Write batches from the queue until None is received.
+
+        The connection is taken, used and returned in the one thread of
+        the consumer, so its saver and cursor never change threads.
+        """
+        loop = asyncio.get_running_loop()
+        writer = ThreadPoolExecutor(max_workers=1)
+        self.writers.append(writer)
+
+        def write(func, *args):
+            return loop.run_in_executor(writer, func, *args)
+
+        conn = await write(self.pool.getconn)
+        try:
+            saver = await write(
+                functools.partial(self.saver_class, conn, stats=self.stats)
+            )
+            stack = ExitStack()
+            await write(
+                stack.enter_context, saver.prepare_insert_context(model)
+            )
+            while (batch := await queue.get()) is not None:
+                await write(saver.save_checked_rows, batch, model)
+                await write(conn.commit)
+            await write(stack.close)
+            await write(conn.commit)
+        except BaseException:
+            # runs after a write still going in the thread of a cancelled
+            # task; closing drops prepared statements of the failed session
+            writer.submit(self.pool.putconn, conn, close=True)
+            raise
+        else:
+            await write(self.pool.putconn, conn)
+        finally:
+            writer.shutdown(wait=False)
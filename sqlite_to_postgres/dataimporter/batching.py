@@ -0,0 +1,64 @@
+from typing import Sequence
+
+
+def estimate_bytes(rows: Sequence, sample: int = 16) -> int:
+    """Estimate size of batch values from a sample of its rows."""
+    if not rows:
+        return 0
+    sampled = rows[:sample]
+    sampled_bytes = sum(
+        len(value) if isinstance(value, str) else 8
+        for row in sampled
+        for value in row
+    )
+    return sampled_bytes * len(rows) // len(sampled)
+
+
+class AdaptiveBatchSize:
+    """Batch size steered toward a target time of saving a batch.
+
+    After every batch the size is moved to the number of rows that would
+    be saved in target_seconds at the measured speed, limited by
+    max_bytes of values per batch. To keep it stable on noisy timings
+    the size changes at most twice per batch.
+    """
+
+    def __init__(
+        self,
+        initial: int = 100,
+        minimum: int = 10,
+        maximum: int = 50_000,
+        target_seconds: float = 0.5,
+        max_bytes: int = 64 * 2**20,
+    ):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.size = initial
+
+    def __call__(self) -> int:
+        return self.size
+
+    def fresh(self) -> 'AdaptiveBatchSize':
+        """Return controller with the same limits for another table."""
+        return AdaptiveBatchSize(
+            self.initial,
+            self.minimum,
+            self.maximum,
+            self.target_seconds,
+            self.max_bytes,
+        )
+
+    def update(self, rows: int, seconds: float, nbytes: int):
+        """Adjust size by the rows, time and bytes of the last batch."""
+        if not rows:
+            return
+        wanted = (
+            self.target_seconds * rows / seconds if seconds else self.maximum
+        )
+        if nbytes:
+            wanted = min(wanted, self.max_bytes * rows / nbytes)
+        wanted = min(max(wanted, self.size / 2), self.size * 2)
+        self.size = int(min(max(wanted, self.minimum), self.maximum))
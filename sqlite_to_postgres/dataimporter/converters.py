@@ -0,0 +1,45 @@
+import uuid
+from datetime import datetime
+from typing import Callable, Iterable, List, Sequence
+
+# values used instead of NULL in the source, the same as in
+# SQLiteExtractor.transform
+NULL_DEFAULTS = {'description': "''", 'rating': '0.0'}
+
+# values generated for columns missing in the source, the same as
+# default factories of dataimporter.models
+GENERATED = {'id': 'str(_uuid4())', 'created': 'now', 'modified': 'now'}
+
+
+def compile_converter(
+    source_columns: Sequence[str], target_columns: Sequence[str]
+) -> Callable[[Iterable[tuple]], List[tuple]]:
+    """Compile converter of a batch of SQLite tuples to Postgres parameters.
+
+    The converter takes rows selected as source_columns and returns
+    tuples in target_columns order without building intermediate dicts
+    or dataclasses. NULL defaults are applied inline, and creation
+    timestamps are taken once per batch. No target columns usually
+    mean that the table is missing in Postgres, it is a ValueError.
+    """
+    if not target_columns:
+        raise ValueError('No target columns to convert rows to')
+    positions = {name: i for i, name in enumerate(source_columns)}
+    items = []
+    for column in target_columns:
+        if column in positions:
+            item = f'row[{positions[column]}]'
+            if column in NULL_DEFAULTS:
+                item = f'({item} or {NULL_DEFAULTS[column]})'
+        else:
+            item = GENERATED.get(column, 'None')
+        items.append(item)
+
+    source = (
+        'def convert(rows):\n'
+        '    now = _now()\n'
+        f'    return [({", ".join(items)},) for row in rows]\n'
+    )
+    namespace = {'_now': datetime.now, '_uuid4': uuid.uuid4}
+    exec(compile(source, '<converter>', 'exec'), namespace)
+    return namespace['convert']
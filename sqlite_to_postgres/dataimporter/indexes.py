@@ -0,0 +1,110 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+from psycopg2.extras import DictCursor
+
+from .journal import ProgressJournal
+from .postgres_saver import pg_conn_context
+
+logger = logging.getLogger(__name__)
+
+
+def tables_are_empty(curs, tables: List[str]) -> bool:
+    for table in tables:
+        curs.execute(f'SELECT EXISTS (SELECT 1 FROM content.{table})')
+        if curs.fetchone()[0]:
+            return False
+    return True
+
+
+def secondary_indexes(curs, tables: List[str]) -> List[Tuple[str, str]]:
+    """Return names and definitions of indexes that may be dropped.
+
+    Unique indexes are kept: the primary key is needed by ON CONFLICT
+    (id), and without the indexes of natural keys duplicates would be
+    loaded and fail the rebuild. Indexes of constraints are kept too,
+    constraints can not be dropped as indexes.
+    """
+    curs.execute(
+        'SELECT i.indexname, i.indexdef FROM pg_indexes i '
+        'JOIN pg_index x ON x.indexrelid = '
+        "format('%%I.%%I', i.schemaname, i.indexname)::regclass "
+        "WHERE i.schemaname = 'content' AND i.tablename = ANY(%s) "
+        'AND NOT x.indisunique AND NOT EXISTS (SELECT 1 FROM pg_constraint c '
+        'WHERE c.conindid = x.indexrelid)',
+        (list(tables),),
+    )
+    return [tuple(row) for row in curs.fetchall()]
+
+
+def build_index(dsn: Dict, definition: str, maintenance_work_mem: str):
+    # the index may be left in place when a previous run failed to drop it
+    definition = definition.replace(' INDEX ', ' INDEX IF NOT EXISTS ', 1)
+    with pg_conn_context(dsn, cursor_factory=DictCursor) as conn:
+        curs = conn.cursor()
+        curs.execute('SET maintenance_work_mem = %s', (maintenance_work_mem,))
+        curs.execute(definition)
+
+
+def rebuild_indexes(
+    dsn: Dict,
+    journal: ProgressJournal,
+    workers: int = 4,
+    maintenance_work_mem: str = '1GB',
+):
+    """Build all deferred indexes, several at once on own connections."""
+    indexes = journal.deferred_indexes()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            name: pool.submit(
+                build_index, dsn, definition, maintenance_work_mem
+            )
+            for name, definition in indexes
+        }
+    failed = []
+    for name, future in futures.items():
+        if future.exception():
+            logger.error(
+                'Index %s is not rebuilt: %s', name, future.exception()
+            )
+            failed.append(name)
+        else:
+            journal.forget_index(name)
+    if failed:
+        raise RuntimeError(f'Indexes are not rebuilt: {", ".join(failed)}')
+
+
+@contextmanager
+def deferred_indexes_context(
+    dsn: Dict,
+    tables: List[str],
+    journal: ProgressJournal,
+    workers: int = 4,
+    maintenance_work_mem: str = '1GB',
+    drop: bool = True,
+):
+    """Load into tables without their secondary indexes.
+
+    When all tables are empty their non-unique indexes are dropped, and
+    after a successful load they are rebuilt in parallel. A failed load
+    leaves them dropped, so its error is not hidden by a rebuild error:
+    definitions of dropped indexes are kept in the journal, and indexes
+    dropped by an interrupted run are rebuilt at the end of the next
+    one, also with drop=False. Tables with data are loaded with their
+    indexes as usual.
+    """
+    with pg_conn_context(dsn, cursor_factory=DictCursor) as conn:
+        curs = conn.cursor()
+        if drop and tables_are_empty(curs, tables):
+            indexes = secondary_indexes(curs, tables)
+            journal.defer_indexes(indexes)
+            for name, _ in indexes:
+                curs.execute(f'DROP INDEX content.{name}')
+        elif drop:
+            logger.warning(
+                'Target tables are not empty, indexes are kept during load'
+            )
+    yield
+    rebuild_indexes(dsn, journal, workers, maintenance_work_mem)
@@ -0,0 +1,143 @@
+import sqlite3
+from typing import List, Optional, Tuple
+
+from .sqlite_extractor import KeyRange
+
+
+class ProgressJournal:
+    """Persistent journal of imported rowid ranges.
+
+    After every committed batch the last rowid of the range is stored
+    in a local SQLite file, so an interrupted import is resumed from
+    that point instead of the beginning of the table. Progress is found
+    by rowids rather than by the exact range, so a run with other
+    --workers or --partitions skips rows imported by an earlier one.
+
+    The journal also keeps watermarks of incremental syncs: max rowid and
+    max time of change of every table at the last successful sync, and
+    definitions of indexes dropped for a bulk load until they are rebuilt.
+    """
+
+    def __init__(self, path: str):
+        # several worker processes may write to the journal at once
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS progress ('
+            'model TEXT NOT NULL, '
+            'range_start INTEGER NOT NULL, '
+            'range_stop INTEGER NOT NULL, '
+            'last_key INTEGER NOT NULL, '
+            'rows INTEGER NOT NULL, '
+            'PRIMARY KEY (model, range_start, range_stop))'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS watermark ('
+            'model TEXT PRIMARY KEY, '
+            'last_key INTEGER, '
+            'last_modified TEXT)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS deferred_index ('
+            'name TEXT PRIMARY KEY, '
+            'definition TEXT NOT NULL)'
+        )
+        self.conn.commit()
+
+    def pending(self, key_range: KeyRange) -> List[KeyRange]:
+        """Return parts of the range not imported yet, in rowid order.
+
+        Rows from range_start to last_key of every recorded range are
+        imported, whichever ranges the table was split into.
+        """
+        done = self.conn.execute(
+            'SELECT range_start, last_key FROM progress '
+            'WHERE model = ? AND range_start < ? AND last_key > ? '
+            'ORDER BY range_start',
+            (key_range.model_name, key_range.stop, key_range.start),
+        ).fetchall()
+        parts = []
+        start = key_range.start
+        for done_start, done_stop in done:
+            if done_start > start:
+                parts.append(KeyRange(key_range.model_name, start, done_start))
+            start = max(start, done_stop)
+        if start < key_range.stop:
+            parts.append(KeyRange(key_range.model_name, start, key_range.stop))
+        return parts
+
+    def record(self, key_range: KeyRange, last_key: int, rows: int):
+        """Store the last rowid of a batch committed to Postgres."""
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO progress '
+                '(model, range_start, range_stop, last_key, rows) '
+                'VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (model, range_start, range_stop) DO UPDATE '
+                'SET last_key = excluded.last_key, '
+                'rows = progress.rows + excluded.rows',
+                (
+                    key_range.model_name,
+                    key_range.start,
+                    key_range.stop,
+                    last_key,
+                    rows,
+                ),
+            )
+
+    def watermark(
+        self, model_name: str
+    ) -> Tuple[Optional[int], Optional[str]]:
+        """Return max rowid and time of change synced for the model."""
+        row = self.conn.execute(
+            'SELECT last_key, last_modified FROM watermark WHERE model = ?',
+            (model_name,),
+        ).fetchone()
+        return tuple(row) if row else (None, None)
+
+    def set_watermark(
+        self,
+        model_name: str,
+        last_key: Optional[int],
+        last_modified: Optional[str],
+    ):
+        """Store watermark of the model after a successful sync."""
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO watermark '
+                '(model, last_key, last_modified) VALUES (?, ?, ?)',
+                (model_name, last_key, last_modified),
+            )
+
+    def defer_indexes(self, indexes: List[Tuple[str, str]]):
+        """Remember names and definitions of indexes before dropping them."""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO deferred_index (name, definition) '
+                'VALUES (?, ?)',
+                indexes,
+            )
+
+    def deferred_indexes(self) -> List[Tuple[str, str]]:
+        """Return dropped indexes which are not rebuilt yet."""
+        return self.conn.execute(
+            'SELECT name, definition FROM deferred_index ORDER BY name'
+        ).fetchall()
+
+    def forget_index(self, name: str):
+        """Mark dropped index as rebuilt."""
+        with self.conn:
+            self.conn.execute(
+                'DELETE FROM deferred_index WHERE name = ?', (name,)
+            )
+
+    def reset(self):
+        """Forget progress of ranges, so the next import starts from scratch.
+
+        Watermarks of incremental syncs are kept.
+        """
+        with self.conn:
+            self.conn.execute('DELETE FROM progress')
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,299 @@
+import hashlib
+import sqlite3
+import uuid
+from array import array
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from psycopg2.extensions import connection as _connection
+
+from .stats import ImportStats
+
+# columns of the unique indexes of the tables, see schema_design
+NATURAL_KEYS = {
+    'genre': ('name',),
+    'person': ('full_name',),
+    'film_work': ('title', 'creation_date'),
+    'genre_film_work': ('film_work_id', 'genre_id'),
+    'person_film_work': ('film_work_id', 'person_id', 'role'),
+}
+
+# tables referenced by the columns of link tables
+REFERENCES = {
+    'genre_film_work': {'film_work_id': 'film_work', 'genre_id': 'genre'},
+    'person_film_work': {'film_work_id': 'film_work', 'person_id': 'person'},
+}
+
+
+def key_of(value) -> int:
+    """Return the uuid as a 128-bit int, the compact form kept in memory."""
+    return uuid.UUID(str(value)).int
+
+
+def parse_key(value) -> Optional[int]:
+    """Return key_of the value, None if it is NULL or not a uuid."""
+    try:
+        return key_of(value)
+    except ValueError:
+        return None
+
+
+def natural_key_of(table: str, values: Sequence):
+    """Return hashable natural key of the values of NATURAL_KEYS columns.
+
+    Values are compared as text, so a date read from Postgres matches
+    the same date read from SQLite. Keys of link tables are reduced to
+    a nonzero 128-bit digest of their uuids and role, kept in LinkKeys.
+    None means that the key has NULLs, Postgres does not treat such
+    keys as equal, so they are never duplicates.
+    """
+    if any(value is None for value in values):
+        return None
+    if table in REFERENCES:
+        digest = hashlib.blake2b(digest_size=16)
+        for column, value in zip(NATURAL_KEYS[table], values):
+            if column in REFERENCES[table]:
+                digest.update(key_of(value).to_bytes(16, 'big'))
+            else:
+                digest.update(str(value).encode())
+        return int.from_bytes(digest.digest(), 'big') or 1
+    return tuple(str(value) for value in values)
+
+
+class LinkKeys:
+    """Set of 128-bit digests of link keys held in one flat array.
+
+    A slot is a pair of 64-bit halves of a digest, zeros mark an empty
+    one. Open addressing with linear probing keeps the load factor
+    between 3/8 and 3/4, so a key takes 21 to 43 bytes instead of ~200
+    bytes of a dict entry with a tuple of ints. Digests of different
+    keys collide with probability n**2 / 2**129, about 1e-23 for 50M
+    links.
+    """
+
+    MIN_SLOTS = 1024
+    LOW = 2**64 - 1
+
+    def __init__(self, capacity: int = 0):
+        self.count = 0
+        self.slots = self.empty_slots(capacity)
+
+    @property
+    def size(self) -> int:
+        return len(self.slots) // 2
+
+    def empty_slots(self, capacity: int) -> array:
+        size = max(self.MIN_SLOTS, 1 << (4 * capacity // 3).bit_length())
+        return array('Q', bytes(16 * size))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, key: int) -> bool:
+        """Add the digest, return False if it was already there."""
+        if not self.insert(self.slots, key >> 64, key & self.LOW):
+            return False
+        self.count += 1
+        if 4 * self.count > 3 * self.size:
+            slots = self.empty_slots(self.count)
+            old = self.slots
+            for index in range(0, len(old), 2):
+                if old[index] or old[index + 1]:
+                    self.insert(slots, old[index], old[index + 1])
+            self.slots = slots
+        return True
+
+    @staticmethod
+    def insert(slots: array, high: int, low: int) -> bool:
+        # slot counts are powers of 2, digests are uniform in all bits
+        mask = len(slots) // 2 - 1
+        index = 2 * (low & mask)
+        while slots[index] or slots[index + 1]:
+            if slots[index] == high and slots[index + 1] == low:
+                return False
+            index = (index + 2) & (2 * mask + 1)
+        slots[index] = high
+        slots[index + 1] = low
+        return True
+
+
+class KeyIndex:
+    """Ids and natural keys of imported tables kept to check batches.
+
+    Parent ids are sets of ints and natural keys of parents map to the
+    int id of their row, natural keys of links are LinkKeys digests, so
+    link rows and natural keys are checked in memory before they reach
+    Postgres, which has no foreign keys:
+
+    - a parent row repeating the natural key of a row with another id
+      is dropped, and links to its id are remapped to the existing one;
+    - a link row repeating an existing link is dropped, the same link
+      saved by an earlier run is dropped too, having no id to compare;
+    - a link row referencing a missing parent is returned as an orphan,
+      as is a row with an id or a reference which is not a uuid.
+
+    Ids of link rows are not kept, nothing references them. The index of
+    a table is read from Postgres on its first use, so rows of earlier
+    runs and of other worker processes are known. A reference missing
+    from memory is looked up in the SQLite source by natural key, which
+    finds duplicates remapped by another process or run.
+    """
+
+    LOOKUP_CHUNK = 500
+
+    def __init__(
+        self,
+        sqlite_conn: sqlite3.Connection,
+        pg_conn: _connection,
+        stats: Optional[ImportStats] = None,
+    ):
+        self.sqlite_conn = sqlite_conn
+        self.pg_conn = pg_conn
+        self.stats = stats or ImportStats()
+        self.ids: Dict[str, Set[int]] = {}
+        self.natural: Dict[str, Union[Dict, LinkKeys]] = {}
+        self.remapped: Dict[str, Dict[int, int]] = {}
+
+    def load(self, table: str):
+        """Read ids and natural keys of the rows saved to Postgres."""
+        if table in self.natural:
+            return
+        ids = self.ids[table] = set()
+        self.remapped[table] = {}
+        is_parent = table not in REFERENCES
+        if is_parent:
+            natural = self.natural[table] = {}
+        else:
+            natural = self.natural[table] = LinkKeys(self.source_rows(table))
+        columns = ', '.join(('id', *NATURAL_KEYS[table]))
+        # a named cursor streams rows instead of fetching the whole table
+        with self.pg_conn.cursor(name=f'key_index_{table}') as curs:
+            curs.itersize = 100_000
+            curs.execute(f'SELECT {columns} FROM content.{table}')
+            for row in curs:
+                natural_key = natural_key_of(table, row[1:])
+                if not is_parent:
+                    if natural_key is not None:
+                        natural.add(natural_key)
+                    continue
+                key = key_of(row[0])
+                ids.add(key)
+                if natural_key is not None:
+                    natural[natural_key] = key
+
+    def source_rows(self, table: str) -> int:
+        """Return the row count of the source table to size its index."""
+        curs = self.sqlite_conn.cursor()
+        curs.execute(f'SELECT COUNT(*) FROM {table}')
+        (count,) = curs.fetchone()
+        curs.close()
+        return count
+
+    def check(
+        self, table: str, columns: Sequence[str], rows: List[tuple]
+    ) -> Tuple[List[tuple], List[Tuple[tuple, str]]]:
+        """Return rows to save and orphan rows with their errors.
+
+        Rows are tuples ordered as columns, remapped references are
+        replaced in them. Indexes are updated as if the returned rows
+        were saved.
+        """
+        if table not in NATURAL_KEYS:
+            return rows, []
+        self.load(table)
+        references = [
+            (columns.index(column), parent)
+            for column, parent in REFERENCES.get(table, {}).items()
+        ]
+        for index, parent in references:
+            self.load(parent)
+            self.resolve_missing(parent, {row[index] for row in rows})
+
+        is_parent = not references
+        id_index = columns.index('id')
+        key_indexes = [columns.index(column) for column in NATURAL_KEYS[table]]
+        ids = self.ids[table]
+        natural = self.natural[table]
+        remapped = self.remapped[table]
+        saved, orphans = [], []
+        for row in rows:
+            row, errors = self.remap_references(row, columns, references)
+            if errors:
+                orphans.append((row, '; '.join(errors)))
+                continue
+
+            natural_key = natural_key_of(
+                table, [row[index] for index in key_indexes]
+            )
+            if not is_parent:
+                if natural_key is None or natural.add(natural_key):
+                    saved.append(row)
+                else:
+                    self.stats.add(table, rows_remapped=1)
+                continue
+            key = parse_key(row[id_index])
+            if key is None:
+                orphans.append((row, f'id {row[id_index]!r} is not a uuid'))
+                continue
+            existing = natural.get(natural_key)
+            if existing is not None and existing != key and key not in ids:
+                # a row with a known id is an update left to Postgres
+                remapped[key] = existing
+                self.stats.add(table, rows_remapped=1)
+                continue
+            ids.add(key)
+            if natural_key is not None:
+                natural[natural_key] = key
+            saved.append(row)
+        return saved, orphans
+
+    def remap_references(self, row: tuple, columns, references):
+        """Return the row with remapped references and errors of others."""
+        errors = []
+        for index, parent in references:
+            reference = parse_key(row[index])
+            if reference is None:
+                errors.append(
+                    f'{columns[index]} {row[index]!r} is not a uuid'
+                )
+            elif reference in self.remapped[parent]:
+                existing = uuid.UUID(int=self.remapped[parent][reference])
+                row = (*row[:index], str(existing), *row[index + 1:])
+            elif reference not in self.ids[parent]:
+                errors.append(
+                    f'{columns[index]} {row[index]} is missing in {parent}'
+                )
+        return row, errors
+
+    def resolve_missing(self, table: str, references):
+        """Remap references missing from the index via the source rows.
+
+        A parent dropped as a duplicate by another process or an earlier
+        run is not in memory, its natural key in the source leads to the
+        id it was remapped to.
+        """
+        missing = []
+        for reference in references:
+            key = parse_key(reference)
+            if (
+                key is not None
+                and key not in self.ids[table]
+                and key not in self.remapped[table]
+            ):
+                missing.append(reference)
+        columns = ', '.join(('id', *NATURAL_KEYS[table]))
+        curs = self.sqlite_conn.cursor()
+        # chunks stay below the limit of SQLite query parameters
+        for start in range(0, len(missing), self.LOOKUP_CHUNK):
+            chunk = missing[start:start + self.LOOKUP_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            curs.execute(
+                f'SELECT {columns} FROM {table} WHERE id IN ({placeholders})',
+                chunk,
+            )
+            for row in curs.fetchall():
+                existing = self.natural[table].get(
+                    natural_key_of(table, tuple(row)[1:])
+                )
+                if existing is not None:
+                    self.remapped[table][key_of(row[0])] = existing
+        curs.close()
@@ -0,0 +1,146 @@
+import time
+from itertools import chain
+from typing import Optional, Union
+
+from .batching import AdaptiveBatchSize, estimate_bytes
+from .journal import ProgressJournal
+from .keys import KeyIndex
+from .postgres_saver import PostgresSaver
+from .sqlite_extractor import KeyRange, SQLiteExtractor
+
+
+def build_converter(postgres_saver: PostgresSaver, model):
+    """Return converter of SQLite rows of the model to insert parameters.
+
+    It is compiled once per insert plan and reused by the next savers.
+    """
+    return postgres_saver.plan(model).converter(
+        SQLiteExtractor.source_columns(model)
+    )
+
+
+def check_keys(
+    key_index: KeyIndex, postgres_saver: PostgresSaver, model, rows
+):
+    """Return rows passing checks of keys, orphans are quarantined."""
+    table_name = postgres_saver.model_2_table_name(model)
+    columns = postgres_saver.target_columns(model)
+    rows, orphans = key_index.check(table_name, columns, rows)
+    for row, error in orphans:
+        postgres_saver.reject(table_name, columns, row, error)
+    return rows
+
+
+def load_range(
+    sqlite_extractor: SQLiteExtractor,
+    postgres_saver: PostgresSaver,
+    model,
+    key_range: KeyRange,
+    journal: Optional[ProgressJournal] = None,
+    batch_size: Union[int, AdaptiveBatchSize] = 100,
+    commit_rows: int = 0,
+    key_index: Optional[KeyIndex] = None,
+):
+    """Move rows of one rowid range of the model from SQLite to Postgres.
+
+    With a journal every batch is committed and recorded, and only the
+    parts of the range not recorded yet are read. commit_rows > 0 commits
+    once at least that many rows are saved, with or without a journal.
+    With AdaptiveBatchSize the size of every next batch follows the time
+    of saving previous ones. With a key_index batches pass checks of
+    keys first, the saver must have a quarantine for orphan rows.
+    """
+    pending_ranges = journal.pending(key_range) if journal else [key_range]
+
+    adaptive = isinstance(batch_size, AdaptiveBatchSize)
+    if adaptive:
+        batch_size = batch_size.fresh()
+
+    commits = journal is not None or commit_rows > 0
+    uncommitted_rows = 0
+    convert = build_converter(postgres_saver, model)
+    batches = chain.from_iterable(
+        sqlite_extractor.extract_range(model, part, batch_size, convert)
+        for part in pending_ranges
+    )
+    with postgres_saver.prepare_insert_context(model):
+        for last_key, batch_rows in batches:
+            started = time.perf_counter()
+            read_rows = len(batch_rows)
+            if key_index:
+                batch_rows = check_keys(
+                    key_index, postgres_saver, model, batch_rows
+                )
+            postgres_saver.save_checked_rows(batch_rows, model)
+            uncommitted_rows += read_rows
+            if commits and uncommitted_rows >= commit_rows:
+                postgres_saver.conn.commit()
+                if journal:
+                    journal.record(key_range, last_key, uncommitted_rows)
+                uncommitted_rows = 0
+            if adaptive:
+                batch_size.update(
+                    read_rows,
+                    time.perf_counter() - started,
+                    estimate_bytes(batch_rows),
+                )
+    if commits and uncommitted_rows:
+        postgres_saver.conn.commit()
+    if journal:
+        # rowids missing after the last row are covered too
+        journal.record(key_range, key_range.stop, uncommitted_rows)
+
+
+def load_table(
+    sqlite_extractor: SQLiteExtractor,
+    postgres_saver: PostgresSaver,
+    model,
+    journal: Optional[ProgressJournal] = None,
+    batch_size: Union[int, AdaptiveBatchSize] = 100,
+    commit_rows: int = 0,
+    key_index: Optional[KeyIndex] = None,
+):
+    """Move all rows of the model from SQLite to Postgres batch by batch."""
+    for key_range in sqlite_extractor.split(model, 1):
+        load_range(
+            sqlite_extractor,
+            postgres_saver,
+            model,
+            key_range,
+            journal,
+            batch_size,
+            commit_rows,
+            key_index,
+        )
+
+
+def sync_table(
+    sqlite_extractor: SQLiteExtractor,
+    postgres_saver: PostgresSaver,
+    model,
+    journal: ProgressJournal,
+    since: Optional[str] = None,
+    key_index: Optional[KeyIndex] = None,
+):
+    """Move rows added or changed since the last sync of the model.
+
+    The watermark is taken before extraction, so rows changed while
+    syncing are picked up again by the next sync.
+    """
+    since_key, since_modified = journal.watermark(model.__name__)
+    if since:
+        since_modified = since
+    last_key, last_modified = sqlite_extractor.high_water_mark(model)
+
+    convert = build_converter(postgres_saver, model)
+    with postgres_saver.prepare_insert_context(model):
+        for _, batch_rows in sqlite_extractor.extract_changed(
+            model, since_key, since_modified, convert=convert
+        ):
+            if key_index:
+                batch_rows = check_keys(
+                    key_index, postgres_saver, model, batch_rows
+                )
+            postgres_saver.save_checked_rows(batch_rows, model)
+    postgres_saver.conn.commit()
+    journal.set_watermark(model.__name__, last_key, last_modified)
@@ -3,7 +3,7 @@ from dataclasses import dataclass, field
 from datetime import datetime
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Genre:
     name: str
     description: str = ''
@@ -12,7 +12,7 @@ class Genre:
     modified: datetime = field(default_factory=datetime.now)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Person:
     full_name: str
     id: uuid.UUID = field(default_factory=uuid.uuid4)
@@ -20,7 +20,7 @@ class Person:
     modified: datetime = field(default_factory=datetime.now)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class FilmWork:
     title: str
     file_path: str
@@ -33,7 +33,7 @@ class FilmWork:
     modified: datetime = field(default_factory=datetime.now)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GenreFilmWork:
     film_work_id: uuid.UUID
     genre_id: uuid.UUID
@@ -41,7 +41,7 @@ class GenreFilmWork:
     created: datetime = field(default_factory=datetime.now)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PersonFilmWork:
     film_work_id: uuid.UUID
     person_id: uuid.UUID
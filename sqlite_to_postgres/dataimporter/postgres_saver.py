@@ -1,12 +1,27 @@
+import io
+import json
 import re
+import weakref
 from collections import defaultdict
 from contextlib import contextmanager
-from dataclasses import asdict, dataclass
-from typing import Dict
+from dataclasses import asdict, dataclass, field, fields
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 import psycopg2
 from psycopg2.extensions import connection as _connection
-from psycopg2.extras import execute_batch
+from psycopg2.extras import Json, execute_batch
+
+from .converters import compile_converter
+from .stats import ImportStats
+from .validation import build_validator
+
+# errors caused by values of particular rows, as opposed to
+# errors of the connection or of the statement itself
+ROW_ERRORS = (
+    psycopg2.DataError,
+    psycopg2.IntegrityError,
+    psycopg2.errors.CardinalityViolation,
+)
 
 
 @contextmanager
@@ -17,22 +32,93 @@ def pg_conn_context(dsn: Dict, cursor_factory):
     conn.close()
 
 
+@dataclass
+class InsertPlan:
+    """Insert into one table compiled for a schema and a conflict mode.
+
+    The prepared statement name is unique for the table, the mode and
+    the schema, so several plans can be prepared on one connection.
+    """
+
+    table: str
+    columns: Tuple[str, ...]
+    name: str
+    prepare_query: str
+    # EXECUTE of the statement with tuples and with dicts as parameters
+    execute_query: str
+    execute_dict_query: str
+    converters: Dict[Tuple[str, ...], Callable] = field(default_factory=dict)
+
+    def converter(self, source_columns: Sequence[str]) -> Callable:
+        """Return converter of source rows to parameters, compiled once."""
+        source_columns = tuple(source_columns)
+        if source_columns not in self.converters:
+            self.converters[source_columns] = compile_converter(
+                source_columns, self.columns
+            )
+        return self.converters[source_columns]
+
+
 class PostgresSaver:
     _camel_2_snake_case = re.compile(r'(?<!^)(?=[A-Z])')
-    _schema_info = None
+    # columns kept as is when an existing row is updated
+    _immutable_columns = ('id', 'created')
+    # shared by all savers: columns of the content schema by its
+    # fingerprint and plans by table, upsert mode and fingerprint
+    _schemas: Dict[str, Dict] = {}
+    _plans: Dict[Tuple[str, bool, str], InsertPlan] = {}
+    # names of the statements prepared on each connection
+    _prepared = weakref.WeakKeyDictionary()
 
-    def __init__(self, conn: _connection):
+    def __init__(
+        self,
+        conn: _connection,
+        upsert: bool = False,
+        stats: Optional[ImportStats] = None,
+        quarantine: bool = False,
+        count_inserted: bool = False,
+    ):
         self.conn = conn
         self.curs = conn.cursor()
+        self.upsert = upsert
+        self.stats = stats or ImportStats()
+        # counting of rows inserted by prepared statements costs two more
+        # queries per batch, so it is done only on request
+        self.count_inserted = count_inserted
+        self.quarantine = quarantine
+        # counts of rows saved in the open savepoint, kept till its release
+        self._unreleased = None
+        self._validators = {}
+        self._fingerprint = None
+        if quarantine:
+            self.curs.execute(self.build_quarantine_query())
 
     @contextmanager
     def prepare_insert_context(self, model):
         """Ensure that PREPARE statement is executed before insertion.
-        It also deallocates prepare at completion.
+
+        The statement stays prepared for the next savers of the same
+        connection, deallocate_prepare drops it explicitly.
         """
         self.prepare(model)
         yield
-        self.deallocate_prepare()
+
+    def schema_fingerprint(self) -> str:
+        """Return hash of the columns of the content schema.
+
+        It is queried once per saver, a saver made after a migration
+        gets new plans instead of the cached ones.
+        """
+        if self._fingerprint is None:
+            self.curs.execute(
+                "SELECT md5(coalesce(string_agg("
+                "table_name || '.' || column_name || ' ' || data_type, ',' "
+                "ORDER BY table_name, ordinal_position), '')) "
+                "FROM information_schema.columns "
+                "WHERE table_schema IN ('content')"
+            )
+            self._fingerprint = self.curs.fetchone()[0]
+        return self._fingerprint
 
     def get_column_name_and_type(self):
         """Get column names and their types for all content schemas.
@@ -41,8 +127,9 @@ class PostgresSaver:
         dicts with 'column_names' and 'column_types' keys that
         contain lists of column names and types, accordingly.
         """
-        if self._schema_info:  # already requested before
-            return self._schema_info
+        fingerprint = self.schema_fingerprint()
+        if fingerprint in self._schemas:  # already requested before
+            return self._schemas[fingerprint]
 
         result = defaultdict(lambda: defaultdict(list))
         self.curs.execute(
@@ -58,49 +145,319 @@ class PostgresSaver:
             result[table]['column_names'].append(column)
             result[table]['column_types'].append(type)
 
+        self._schemas[fingerprint] = result
         return result
 
-    def build_prepare_query(self, table: str) -> str:
+    def plan(self, model) -> InsertPlan:
+        """Return the insert plan of the model, compiled once per schema."""
+        table = self.model_2_table_name(model)
+        key = (table, self.upsert, self.schema_fingerprint())
+        if key not in self._plans:
+            self._plans[key] = self.compile_plan(table)
+        return self._plans[key]
+
+    def compile_plan(self, table: str) -> InsertPlan:
+        columns = tuple(self.get_column_name_and_type()[table]['column_names'])
+        mode = 'upsert' if self.upsert else 'insert'
+        name = f'{mode}_{table}_{self.schema_fingerprint()[:8]}'
+        placeholders = ', '.join(['%s'] * len(columns))
+        dict_placeholders = ', '.join(f'%({c})s' for c in columns)
+        return InsertPlan(
+            table=table,
+            columns=columns,
+            name=name,
+            prepare_query=self.build_prepare_query(table, name),
+            execute_query=f'EXECUTE {name} ({placeholders})',
+            execute_dict_query=f'EXECUTE {name} ({dict_placeholders})',
+        )
+
+    def build_prepare_query(self, table: str, name: str) -> str:
         """Build SQL PREPARE statement to optimize inserts."""
-        self._schema_info = self.get_column_name_and_type()
-        types = ', '.join(self._schema_info[table]['column_types'])
-        values_count = len(self._schema_info[table]['column_types'])
+        schema_info = self.get_column_name_and_type()
+        types = ', '.join(schema_info[table]['column_types'])
+        values_count = len(schema_info[table]['column_types'])
         values_placeholders = ', '.join(
             ['$' + str(i + 1) for i in range(values_count)]
         )
+        conflict_clause = self.build_conflict_clause(
+            table, schema_info[table]['column_names']
+        )
         return (
-            'PREPARE table_insert '
-            f'({types}) AS INSERT INTO content.{table} '
+            f'PREPARE {name} '
+            f'({types}) AS INSERT INTO content.{table} AS target '
             f'VALUES({values_placeholders}) '
-            'ON CONFLICT (id) DO NOTHING'
+            f'{conflict_clause}'
         )
 
-    def build_insert_query(self, table: str) -> str:
-        """Build SQL INSERT statement."""
-        self._schema_info = self.get_column_name_and_type()
-        values_placeholders = ', '.join(
-            [
-                '%(' + name + ')s'
-                for name in self._schema_info[table]['column_names']
-            ]
+    def build_conflict_clause(self, table: str, columns) -> str:
+        """Build ON CONFLICT clause of the insert statement.
+
+        Existing rows are skipped, or in upsert mode updated
+        when any of their values differ from the inserted ones.
+        """
+        if not self.upsert:
+            return 'ON CONFLICT (id) DO NOTHING'
+
+        updated = [c for c in columns if c not in self._immutable_columns]
+        compared = [c for c in updated if c != 'modified']
+        assignments = ', '.join(f'{c} = EXCLUDED.{c}' for c in updated)
+        target_values = ', '.join(f'target.{c}' for c in compared)
+        excluded_values = ', '.join(f'EXCLUDED.{c}' for c in compared)
+        return (
+            f'ON CONFLICT (id) DO UPDATE SET {assignments} '
+            f'WHERE ({target_values}) IS DISTINCT FROM ({excluded_values})'
         )
-        return f'EXECUTE table_insert ({values_placeholders})'
 
     def prepare(self, model):
-        """Execute PREPARE statement for the model."""
-        table_name = self.model_2_table_name(model)
-        query = self.build_prepare_query(table_name)
-        self.curs.execute(query)
+        """Execute PREPARE statement for the model once per connection."""
+        plan = self.plan(model)
+        prepared = self._prepared.setdefault(self.conn, set())
+        if plan.name not in prepared:
+            self.curs.execute(plan.prepare_query)
+            prepared.add(plan.name)
 
     def save(self, data, model, batch_size=100):
         """Insert a batch of rows to the table."""
-        table_name = self.model_2_table_name(model)
-        query = self.build_insert_query(table_name)
+        plan = self.plan(model)
         args = [asdict(row) for row in data]
-        execute_batch(self.curs, query, args, page_size=batch_size)
+        self.execute_inserts(
+            plan.table, plan.execute_dict_query, args, batch_size
+        )
+
+    def target_columns(self, model) -> List[str]:
+        """Return columns of the model table in the order of save_rows."""
+        return list(self.plan(model).columns)
+
+    def save_rows(self, rows, model, batch_size: Optional[int] = None):
+        """Insert a batch of tuples ordered as target_columns(model).
+
+        It is the fast path for rows made by converters.compile_converter,
+        no dicts are built for them. By default the whole batch is sent
+        in one round trip, so the size of batches read from the source,
+        fixed or adaptive, is also the size of writes.
+        """
+        plan = self.plan(model)
+        self.execute_inserts(
+            plan.table,
+            plan.execute_query,
+            rows,
+            batch_size or max(len(rows), 1),
+        )
+
+    def save_checked_rows(self, rows, model):
+        """Save a batch of tuples, quarantining rows which can not be saved.
+
+        Without quarantine it is save_rows. With it, rows breaking the
+        rules of validation are put aside at once, and a batch failed
+        in Postgres is split in halves until the failing rows are found.
+        Every attempt runs in a savepoint, so only it is rolled back and
+        the rows saved before stay in the transaction.
+        """
+        if not self.quarantine:
+            self.save_rows(rows, model)
+            return
+        table_name = self.model_2_table_name(model)
+        columns = self.target_columns(model)
+        if table_name not in self._validators:
+            self._validators[table_name] = build_validator(table_name, columns)
+        validate = self._validators[table_name]
+        if validate:
+            valid_rows = []
+            for row in rows:
+                if errors := validate(row):
+                    self.reject(table_name, columns, row, '; '.join(errors))
+                else:
+                    valid_rows.append(row)
+            rows = valid_rows
+        if rows:
+            self.save_bisecting(rows, model)
+
+    def save_bisecting(self, rows, model):
+        self.curs.execute('SAVEPOINT batch')
+        self._unreleased = []
+        try:
+            self.save_rows(rows, model)
+        except ROW_ERRORS as error:
+            # rows of the rolled back attempt are not counted
+            self._unreleased = None
+            self.curs.execute('ROLLBACK TO SAVEPOINT batch')
+            self.curs.execute('RELEASE SAVEPOINT batch')
+            if len(rows) == 1:
+                self.reject(
+                    self.model_2_table_name(model),
+                    self.target_columns(model),
+                    rows[0],
+                    str(error).strip(),
+                )
+                return
+            middle = len(rows) // 2
+            self.save_bisecting(rows[:middle], model)
+            self.save_bisecting(rows[middle:], model)
+        else:
+            self.curs.execute('RELEASE SAVEPOINT batch')
+            saved, self._unreleased = self._unreleased, None
+            for counts in saved:
+                self.record_saved(*counts)
+
+    def build_quarantine_query(self) -> str:
+        return (
+            'CREATE TABLE IF NOT EXISTS content.import_quarantine ('
+            'id bigserial PRIMARY KEY, '
+            'table_name text NOT NULL, '
+            'row_data jsonb NOT NULL, '
+            'error text NOT NULL, '
+            'created timestamp with time zone NOT NULL DEFAULT now())'
+        )
+
+    def reject(self, table: str, columns, row, error: str):
+        """Put a row which can not be saved to the quarantine table."""
+        self.curs.execute(
+            'INSERT INTO content.import_quarantine '
+            '(table_name, row_data, error) VALUES (%s, %s, %s)',
+            (
+                table,
+                Json(
+                    dict(zip(columns, row)),
+                    dumps=lambda data: json.dumps(data, default=str),
+                ),
+                error,
+            ),
+        )
+        self.stats.add(table, rows_quarantined=1)
+
+    def execute_inserts(self, table: str, query: str, args, batch_size):
+        """Execute prepared inserts of a batch and record its stats."""
+        with self.stats.timer(table, 'save'):
+            before = self.inserted_rows(table) if self.count_inserted else 0
+            execute_batch(self.curs, query, args, page_size=batch_size)
+            if self.count_inserted:
+                self.record_saved(
+                    table, len(args), self.inserted_rows(table) - before
+                )
+
+    def record_saved(self, table: str, rows: int, inserted: int):
+        """Add counts of a saved batch, or keep them till RELEASE SAVEPOINT.
+
+        Rows inserted and then rolled back to a savepoint are not saved,
+        so counts of a batch in a savepoint are added at its release.
+        """
+        if self._unreleased is not None:
+            self._unreleased.append((table, rows, inserted))
+            return
+        self.stats.add(
+            table, rows_inserted=inserted, rows_skipped=rows - inserted
+        )
+
+    def inserted_rows(self, table: str) -> int:
+        """Return rows inserted or updated in the table by the transaction.
+
+        execute_batch sends many statements at once and keeps only
+        the row count of the last one, so it is taken from statistics.
+        They also count rows rolled back to a savepoint, so only the
+        difference around one successful batch is used.
+        """
+        self.curs.execute(
+            'SELECT n_tup_ins + n_tup_upd FROM pg_stat_xact_user_tables '
+            "WHERE schemaname = 'content' AND relname = %s",
+            (table,),
+        )
+        row = self.curs.fetchone()
+        return row[0] if row else 0
 
     def deallocate_prepare(self):
-        self.curs.execute('DEALLOCATE table_insert')
+        """Drop all statements prepared on the connection."""
+        for name in self._prepared.pop(self.conn, ()):
+            self.curs.execute(f'DEALLOCATE {name}')
+
+    @classmethod
+    def model_2_table_name(cls, model):
+        return cls._camel_2_snake_case.sub('_', model.__name__).lower()
+
+
+class PostgresCopySaver(PostgresSaver):
+    """Saver that streams batches with COPY instead of prepared inserts.
+
+    Every batch is copied into a temporary staging table and moved to the
+    target table with INSERT ... SELECT ... ON CONFLICT (id), so repeated
+    imports stay idempotent.
+    """
 
-    def model_2_table_name(self, model):
-        return self._camel_2_snake_case.sub('_', model.__name__).lower()
+    _copy_escapes = str.maketrans(
+        {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+    )
+
+    @contextmanager
+    def prepare_insert_context(self, model):
+        """Create staging table for the model and drop it at completion."""
+        table_name = self.model_2_table_name(model)
+        self.curs.execute(self.build_staging_query(table_name))
+        yield
+        self.curs.execute(
+            f'DROP TABLE IF EXISTS {self.staging_name(table_name)}'
+        )
+
+    @staticmethod
+    def staging_name(table: str) -> str:
+        return f'staging_{table}'
+
+    def build_staging_query(self, table: str) -> str:
+        """Build SQL statement creating temporary staging table."""
+        return (
+            f'CREATE TEMP TABLE IF NOT EXISTS {self.staging_name(table)} '
+            f'(LIKE content.{table} INCLUDING DEFAULTS)'
+        )
+
+    def build_copy_query(self, table: str, columns) -> str:
+        """Build SQL COPY statement loading rows into staging table."""
+        column_list = ', '.join(columns)
+        return f'COPY {self.staging_name(table)} ({column_list}) FROM STDIN'
+
+    def build_move_query(self, table: str, columns) -> str:
+        """Build SQL statement moving staged rows to the target table."""
+        column_list = ', '.join(columns)
+        return (
+            f'INSERT INTO content.{table} AS target ({column_list}) '
+            f'SELECT {column_list} FROM {self.staging_name(table)} '
+            f'{self.build_conflict_clause(table, columns)}'
+        )
+
+    def to_copy_buffer(self, rows) -> io.StringIO:
+        """Serialize rows to COPY text format (tab separated, \\N as NULL)."""
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(
+                '\t'.join(
+                    '\\N'
+                    if value is None
+                    else str(value).translate(self._copy_escapes)
+                    for value in row
+                )
+            )
+            buffer.write('\n')
+        buffer.seek(0)
+        return buffer
+
+    def save(self, data, model, batch_size=100):
+        """Copy a batch of rows to the table.
+
+        batch_size is accepted for compatibility with PostgresSaver,
+        the whole batch is sent with a single COPY.
+        """
+        columns = [field.name for field in fields(model)]
+        rows = [[getattr(obj, name) for name in columns] for obj in data]
+        self.copy_rows(rows, model, columns)
+
+    def save_rows(self, rows, model, batch_size: Optional[int] = None):
+        """Copy a batch of tuples ordered as target_columns(model)."""
+        self.copy_rows(rows, model, self.target_columns(model))
+
+    def copy_rows(self, rows, model, columns):
+        table_name = self.model_2_table_name(model)
+        with self.stats.timer(table_name, 'save'):
+            self.curs.execute(f'TRUNCATE {self.staging_name(table_name)}')
+            self.curs.copy_expert(
+                self.build_copy_query(table_name, columns),
+                self.to_copy_buffer(rows),
+            )
+            self.curs.execute(self.build_move_query(table_name, columns))
+        self.record_saved(table_name, len(rows), self.curs.rowcount)
@@ -0,0 +1,178 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import fields
+from typing import Dict, Iterable, Optional, Set, Union
+
+from psycopg2.extras import DictCursor
+
+from .batching import AdaptiveBatchSize
+from .journal import ProgressJournal
+from .keys import KeyIndex
+from .loader import load_range
+from .postgres_saver import PostgresSaver, pg_conn_context
+from .sqlite_extractor import KeyRange, SQLiteExtractor, sqlite_conn_context
+from .stats import ImportStats
+
+
+def build_dependency_graph(models: Iterable) -> Dict[type, Set[type]]:
+    """Build graph of models referenced by each model.
+
+    A model depends on another one when it has a `<table>_id` field,
+    e.g. PersonFilmWork.person_id makes it depend on Person.
+    """
+    models = tuple(models)
+    by_table = {PostgresSaver.model_2_table_name(m): m for m in models}
+    graph = {}
+    for model in models:
+        graph[model] = {
+            by_table[field.name[: -len('_id')]]
+            for field in fields(model)
+            if field.name.endswith('_id')
+            and field.name[: -len('_id')] in by_table
+        }
+    return graph
+
+
+def import_range(
+    sqlite_db: str,
+    dsn: Dict,
+    saver_class,
+    model,
+    key_range: KeyRange,
+    journal_path: Optional[str] = None,
+    sqlite_options: Optional[Dict] = None,
+    batch_size: Union[int, AdaptiveBatchSize] = 100,
+    commit_rows: int = 0,
+    check_keys: bool = False,
+):
+    """Import one range of a table with own SQLite/Postgres connections.
+
+    Returns the model and stats of its tables to be merged by the caller.
+    With check_keys the range is checked by its own KeyIndex, which reads
+    the imported parent tables from Postgres.
+    """
+    journal = ProgressJournal(journal_path) if journal_path else None
+    stats = ImportStats()
+    with sqlite_conn_context(
+        sqlite_db, read_only=True, **(sqlite_options or {})
+    ) as sqlite_conn, pg_conn_context(
+        dsn, cursor_factory=DictCursor
+    ) as pg_conn:
+        key_index = (
+            KeyIndex(sqlite_conn, pg_conn, stats) if check_keys else None
+        )
+        load_range(
+            SQLiteExtractor(sqlite_conn, stats),
+            saver_class(pg_conn, stats=stats),
+            model,
+            key_range,
+            journal,
+            batch_size,
+            commit_rows,
+            key_index,
+        )
+    if journal:
+        journal.close()
+    return model, dict(stats.tables)
+
+
+class ParallelImporter:
+    """Import independent tables concurrently on a pool of workers.
+
+    A table is scheduled as soon as all tables it depends on are imported.
+    Every worker is a separate process with its own connections, so
+    conversion of rows uses all available cores. With partitions > 1
+    every table is split into rowid ranges imported by several workers.
+    """
+
+    def __init__(
+        self,
+        sqlite_db: str,
+        dsn: Dict,
+        saver_class=PostgresSaver,
+        workers: int = 4,
+        partitions: int = 1,
+        journal_path: Optional[str] = None,
+        sqlite_options: Optional[Dict] = None,
+        stats: Optional[ImportStats] = None,
+        batch_size: Union[int, AdaptiveBatchSize] = 100,
+        commit_rows: int = 0,
+        check_keys: bool = False,
+    ):
+        self.sqlite_db = sqlite_db
+        self.dsn = dsn
+        self.saver_class = saver_class
+        self.workers = workers
+        self.partitions = partitions
+        self.journal_path = journal_path
+        self.sqlite_options = sqlite_options or {}
+        self.stats = stats or ImportStats()
+        self.batch_size = batch_size
+        self.commit_rows = commit_rows
+        self.check_keys = check_keys
+
+    def run(self, models: Iterable):
+        graph = build_dependency_graph(models)
+        done = set()
+        remaining = {}  # number of not imported ranges per model
+        running = set()
+        with sqlite_conn_context(
+            self.sqlite_db, read_only=True, **self.sqlite_options
+        ) as sqlite_conn, ProcessPoolExecutor(
+            max_workers=self.workers
+        ) as pool:
+            extractor = SQLiteExtractor(sqlite_conn)
+            while graph or running:
+                running |= self.submit_ready(
+                    pool, extractor, graph, done, remaining
+                )
+                if graph and not running:
+                    raise ValueError(
+                        f'Cyclic dependencies between tables: {list(graph)}'
+                    )
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    try:
+                        model, tables = future.result()
+                    except BaseException:
+                        # ranges not started yet are dropped, the pool
+                        # only waits for the running ones at exit
+                        for pending in running:
+                            pending.cancel()
+                        raise
+                    self.stats.merge(tables)
+                    remaining[model] -= 1
+                    if not remaining[model]:
+                        done.add(model)
+
+    def submit_ready(self, pool, extractor, graph, done, remaining):
+        """Submit ranges of all tables whose dependencies are imported.
+
+        Empty tables are marked as done at once, which may make
+        their dependents ready too.
+        """
+        submitted = set()
+        while ready := [m for m, deps in graph.items() if deps <= done]:
+            for model in ready:
+                del graph[model]
+                key_ranges = extractor.split(model, self.partitions)
+                if not key_ranges:
+                    done.add(model)
+                    continue
+                remaining[model] = len(key_ranges)
+                submitted.update(
+                    pool.submit(
+                        import_range,
+                        self.sqlite_db,
+                        self.dsn,
+                        self.saver_class,
+                        model,
+                        key_range,
+                        self.journal_path,
+                        self.sqlite_options,
+                        self.batch_size,
+                        self.commit_rows,
+                        self.check_keys,
+                    )
+                    for key_range in key_ranges
+                )
+        return submitted
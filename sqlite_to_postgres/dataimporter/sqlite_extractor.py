@@ -1,44 +1,110 @@
+import math
 import sqlite3
 from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
 from string import Template
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
 from .models import FilmWork, Genre, GenreFilmWork, Person, PersonFilmWork
+from .stats import ImportStats
 
 
 @contextmanager
-def sqlite_conn_context(db_path: str, read_only: bool = False):
+def sqlite_conn_context(
+    db_path: str,
+    read_only: bool = False,
+    profile: Optional[Dict] = None,
+    immutable: bool = False,
+):
+    """Open SQLite connection.
+
+    profile is a dict of PRAGMAs applied to the connection,
+    e.g. config.SQLITE_READ_PROFILE for fast reads of large sources.
+    immutable tells SQLite the file never changes while it is open,
+    so reads skip locking and change detection.
+    """
     db_path_template = (
         Template('file:$db_path?mode=ro')
         if read_only
         else Template('file:$db_path')
     )
+    uri = db_path_template.substitute(db_path=db_path)
+    if read_only and immutable:
+        uri += '&immutable=1'
 
-    conn = sqlite3.connect(
-        db_path_template.substitute(db_path=db_path), uri=True
-    )
+    conn = sqlite3.connect(uri, uri=True)
     conn.row_factory = sqlite3.Row
+    for pragma, value in (profile or {}).items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
     with conn:
         yield conn
     conn.close()
 
 
+def source_time(value: str) -> str:
+    """Return ISO 8601 time as text comparable with source timestamps.
+
+    Times of changes are stored in UTC as text like
+    '2021-06-16 20:14:09.123456+00' and compared as text, so a 'T'
+    separator or another offset would break the order.
+    """
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    if moment.microsecond:
+        return moment.strftime('%Y-%m-%d %H:%M:%S.%f')
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+@dataclass(frozen=True)
+class KeyRange:
+    """Range of SQLite rowids of a table: start < rowid <= stop."""
+
+    model_name: str
+    start: int
+    stop: int
+
+
 class SQLiteExtractor:
-    QUERIES = {
-        Genre.__name__: 'SELECT id, name, description FROM genre;',
-        Person.__name__: 'SELECT id, full_name FROM person',
+    SOURCES = {
+        Genre.__name__: ('genre', ('id', 'name', 'description')),
+        Person.__name__: ('person', ('id', 'full_name')),
         FilmWork.__name__: (
-            'SELECT id, title, description, creation_date, file_path, '
-            'rating, type FROM film_work;'
+            'film_work',
+            (
+                'id',
+                'title',
+                'description',
+                'creation_date',
+                'file_path',
+                'rating',
+                'type',
+            ),
         ),
         PersonFilmWork.__name__: (
-            'SELECT id, film_work_id, person_id, role FROM person_film_work'
+            'person_film_work',
+            ('id', 'film_work_id', 'person_id', 'role'),
         ),
         GenreFilmWork.__name__: (
-            'SELECT id, film_work_id, genre_id FROM genre_film_work'
+            'genre_film_work',
+            ('id', 'film_work_id', 'genre_id'),
         ),
     }
 
+    QUERIES = {
+        name: f'SELECT {", ".join(columns)} FROM {table}'
+        for name, (table, columns) in SOURCES.items()
+    }
+
+    KEYSET_QUERY = Template(
+        'SELECT rowid, $columns FROM $table '
+        'WHERE rowid > ? AND $condition ORDER BY rowid LIMIT ?'
+    )
+
+    # columns holding time of the last change of a source row
+    MODIFIED_COLUMNS = ('updated_at', 'modified')
+
     def transform(row: sqlite3.Row) -> Dict:
         """Transform Row object to Dict.
         Substitutes description and rating NULL values with their default.
@@ -53,17 +119,170 @@ class SQLiteExtractor:
                 result[key] = row[key]
         return result
 
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(
+        self, conn: sqlite3.Connection, stats: Optional[ImportStats] = None
+    ):
         self.conn = conn
+        self.stats = stats or ImportStats()
 
     def extract(self, model, batch_size=100):
+        table, _ = SQLiteExtractor.SOURCES[model.__name__]
         curs = self.conn.cursor()
         curs.execute(SQLiteExtractor.QUERIES[model.__name__])
-        while data := curs.fetchmany(size=batch_size):
-            objs = map(
-                lambda row: model(**SQLiteExtractor.transform(row)), data
-            )
-            if data:
-                yield objs
+        while True:
+            with self.stats.timer(table, 'fetch'):
+                data = curs.fetchmany(size=batch_size)
+            if not data:
+                break
+            with self.stats.timer(table, 'convert'):
+                objs = SQLiteExtractor.to_models(model, data)
+            self.stats.add(table, rows_read=len(data), batches=1)
+            yield objs
         curs.close()
         return
+
+    @staticmethod
+    def to_models(model, rows) -> List:
+        """Build model objects of a batch sharing one creation timestamp."""
+        now = datetime.now()
+        timestamps = {
+            field.name: now
+            for field in fields(model)
+            if field.name in ('created', 'modified')
+        }
+        return [
+            model(**SQLiteExtractor.transform(row), **timestamps)
+            for row in rows
+        ]
+
+    def split(self, model, parts: int) -> List[KeyRange]:
+        """Split table of the model into disjoint rowid ranges."""
+        table, _ = SQLiteExtractor.SOURCES[model.__name__]
+        curs = self.conn.cursor()
+        curs.execute(f'SELECT MIN(rowid), MAX(rowid) FROM {table}')
+        first, last = curs.fetchone()
+        curs.close()
+        if first is None:  # empty table
+            return []
+
+        step = math.ceil((last - first + 1) / max(parts, 1))
+        return [
+            KeyRange(model.__name__, start, min(start + step, last))
+            for start in range(first - 1, last, step)
+        ]
+
+    def extract_range(
+        self, model, key_range: KeyRange, batch_size=100, convert=None
+    ):
+        """Extract rows of the range ordered by rowid.
+
+        Yields pairs of the last rowid in the batch and the batch objects,
+        so extraction can be resumed from a range starting at that rowid.
+        """
+        yield from self.extract_keyset(
+            model,
+            key_range.start,
+            'rowid <= ?',
+            (key_range.stop,),
+            batch_size,
+            convert,
+        )
+
+    def extract_changed(
+        self,
+        model,
+        since_key: Optional[int] = None,
+        since_modified: Optional[str] = None,
+        batch_size=100,
+        convert=None,
+    ):
+        """Extract rows added after since_key or changed after since_modified.
+
+        Changes are detected only for tables having one of
+        MODIFIED_COLUMNS, other tables are synced by new rowids only.
+        """
+        modified_column = self.modified_column(model)
+        if since_key is None and since_modified is None:
+            condition, params = '1 = 1', ()
+        elif modified_column and since_modified is not None:
+            condition = f'(rowid > ? OR {modified_column} > ?)'
+            params = (since_key or 0, since_modified)
+        else:
+            condition, params = 'rowid > ?', (since_key or 0,)
+        yield from self.extract_keyset(
+            model, 0, condition, params, batch_size, convert
+        )
+
+    def extract_keyset(
+        self,
+        model,
+        start: int,
+        condition: str,
+        params: tuple,
+        batch_size,
+        convert=None,
+    ):
+        """Walk rows matching condition in rowid order after start rowid.
+
+        Batches are lists of model objects, or, when convert is given,
+        whatever it returns for plain tuples of source_columns(model).
+        batch_size may be a callable, e.g. batching.AdaptiveBatchSize,
+        asked for the size before every batch.
+        """
+        table, columns = SQLiteExtractor.SOURCES[model.__name__]
+        query = SQLiteExtractor.KEYSET_QUERY.substitute(
+            table=table, columns=', '.join(columns), condition=condition
+        )
+        curs = self.conn.cursor()
+        if convert:
+            curs.row_factory = None  # plain tuples are the cheapest rows
+        last_key = start
+        while True:
+            limit = batch_size() if callable(batch_size) else batch_size
+            self.stats.record_batch_size(table, limit)
+            with self.stats.timer(table, 'fetch'):
+                curs.execute(query, (last_key, *params, limit))
+                data = curs.fetchall()
+            if not data:
+                break
+            last_key = data[-1][0]
+            with self.stats.timer(table, 'convert'):
+                batch = (
+                    convert(data)
+                    if convert
+                    else SQLiteExtractor.to_models(
+                        model, (dict(zip(columns, row[1:])) for row in data)
+                    )
+                )
+            self.stats.add(table, rows_read=len(data), batches=1)
+            yield last_key, batch
+        curs.close()
+
+    @staticmethod
+    def source_columns(model) -> Tuple[str, ...]:
+        """Return columns of raw rows passed to convert by extract_keyset."""
+        _, columns = SQLiteExtractor.SOURCES[model.__name__]
+        return ('rowid', *columns)
+
+    def modified_column(self, model) -> Optional[str]:
+        """Return the column with time of the last change, if table has it."""
+        table, _ = SQLiteExtractor.SOURCES[model.__name__]
+        curs = self.conn.cursor()
+        curs.execute(f'PRAGMA table_info({table})')
+        names = {row[1] for row in curs.fetchall()}
+        curs.close()
+        return next(
+            (c for c in SQLiteExtractor.MODIFIED_COLUMNS if c in names), None
+        )
+
+    def high_water_mark(self, model) -> Tuple[Optional[int], Optional[str]]:
+        """Return max rowid and max time of change of the model table."""
+        table, _ = SQLiteExtractor.SOURCES[model.__name__]
+        modified_column = self.modified_column(model)
+        curs = self.conn.cursor()
+        curs.execute(
+            f'SELECT MAX(rowid), MAX({modified_column or "NULL"}) FROM {table}'
+        )
+        result = tuple(curs.fetchone())
+        curs.close()
+        return result
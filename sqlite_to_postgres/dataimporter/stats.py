@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+STAGES = ('fetch', 'convert', 'save')
+
+
+@dataclass
+class TableStats:
+    rows_read: int = 0
+    # inserted, or inserted and updated in upsert mode
+    rows_inserted: int = 0
+    # rows left as is by ON CONFLICT
+    rows_skipped: int = 0
+    # rows rejected by validation or by Postgres and put to quarantine
+    rows_quarantined: int = 0
+    # duplicates of natural keys dropped by checks of keys
+    rows_remapped: int = 0
+    batches: int = 0
+    fetch_seconds: float = 0.0
+    convert_seconds: float = 0.0
+    save_seconds: float = 0.0
+    # bounds of batch sizes requested from the source
+    min_batch_size: int = 0
+    max_batch_size: int = 0
+
+    COUNTERS = (
+        'rows_read',
+        'rows_inserted',
+        'rows_skipped',
+        'rows_quarantined',
+        'rows_remapped',
+        'batches',
+        'fetch_seconds',
+        'convert_seconds',
+        'save_seconds',
+    )
+
+
+class ImportStats:
+    """Per-table counters and stage timings of an import run.
+
+    Counters are updated from several threads, worker processes
+    send their tables back to be merged into the main stats.
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, TableStats] = defaultdict(TableStats)
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, table: str, **counters):
+        with self._lock:
+            stats = self.tables[table]
+            for name, value in counters.items():
+                setattr(stats, name, getattr(stats, name) + value)
+
+    def record_batch_size(self, table: str, size: int):
+        with self._lock:
+            stats = self.tables[table]
+            stats.min_batch_size = min(stats.min_batch_size or size, size)
+            stats.max_batch_size = max(stats.max_batch_size, size)
+
+    @contextmanager
+    def timer(self, table: str, stage: str):
+        """Add time spent in the block to the stage of the table."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(
+                table, **{f'{stage}_seconds': time.perf_counter() - started}
+            )
+
+    def merge(self, tables: Dict[str, TableStats]):
+        for table, stats in tables.items():
+            self.add(
+                table,
+                **{name: getattr(stats, name) for name in TableStats.COUNTERS},
+            )
+            if stats.max_batch_size:
+                self.record_batch_size(table, stats.min_batch_size)
+                self.record_batch_size(table, stats.max_batch_size)
+
+    def summary(self) -> Dict:
+        # may be taken by another thread while the import is running
+        with self._lock:
+            tables = {
+                table: asdict(stats) for table, stats in self.tables.items()
+            }
+        elapsed = time.monotonic() - self.started
+        rows = sum(stats['rows_read'] for stats in tables.values())
+        return {
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(rows / elapsed, 1) if elapsed else 0.0,
+            'tables': tables,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), ensure_ascii=False)
+
+    def to_text(self) -> str:
+        """Render summary as a table for humans."""
+        header = (
+            f'{"table":<18}{"read":>11}{"inserted":>11}{"skipped":>11}'
+            f'{"rejected":>11}{"remapped":>11}{"batches":>9}'
+            f'{"batch size":>14}'
+            f'{"fetch,s":>10}{"convert,s":>11}{"save,s":>10}'
+        )
+        lines = [header]
+        for table, stats in self.tables.items():
+            lines.append(
+                f'{table:<18}{stats.rows_read:>11}{stats.rows_inserted:>11}'
+                f'{stats.rows_skipped:>11}{stats.rows_quarantined:>11}'
+                f'{stats.rows_remapped:>11}{stats.batches:>9}'
+                f'{f"{stats.min_batch_size}-{stats.max_batch_size}":>14}'
+                f'{stats.fetch_seconds:>10.2f}{stats.convert_seconds:>11.2f}'
+                f'{stats.save_seconds:>10.2f}'
+            )
+        summary = self.summary()
+        lines.append(
+            f'total {summary["elapsed_seconds"]:.2f}s, '
+            f'{summary["rows_per_second"]:,.0f} rows/s'
+        )
+        return '\n'.join(lines)
+
+    def to_prometheus(self) -> str:
+        """Render counters in Prometheus text exposition format."""
+        lines = []
+        for name in TableStats.COUNTERS:
+            if name.endswith('_seconds'):
+                continue
+            metric = f'dataimporter_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for table, stats in self.tables.items():
+                value = getattr(stats, name)
+                lines.append(f'{metric}{{table="{table}"}} {value}')
+
+        metric = 'dataimporter_stage_seconds_total'
+        lines.append(f'# TYPE {metric} counter')
+        for table, stats in self.tables.items():
+            for stage in STAGES:
+                value = getattr(stats, f'{stage}_seconds')
+                lines.append(
+                    f'{metric}{{table="{table}",stage="{stage}"}} {value:.6f}'
+                )
+
+        metric = 'dataimporter_batch_size'
+        lines.append(f'# TYPE {metric} gauge')
+        for table, stats in self.tables.items():
+            for bound in ('min', 'max'):
+                value = getattr(stats, f'{bound}_batch_size')
+                labels = f'table="{table}",bound="{bound}"'
+                lines.append(f'{metric}{{{labels}}} {value}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,54 @@
+from typing import Callable, Dict, List, Optional, Sequence
+
+# The same limits as validators and choices of movies.models. Postgres
+# does not check them, so rows breaking them are caught before saving.
+FILM_TYPES = ('movie', 'tv_show')
+
+
+def rating_in_range(value) -> Optional[str]:
+    # SQLite keeps any value in any column, text is parsed as Postgres does
+    if value is None:
+        return None
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        return f'rating {value!r} is not a number'
+    if not 0 <= rating <= 100:
+        return f'rating {value} is out of range 0..100'
+    return None
+
+
+def known_film_type(value) -> Optional[str]:
+    if value not in FILM_TYPES:
+        return f'unknown type {value!r}'
+    return None
+
+
+RULES: Dict[str, Dict[str, Callable]] = {
+    'film_work': {
+        'rating': rating_in_range,
+        'type': known_film_type,
+    },
+}
+
+
+def build_validator(
+    table: str, columns: Sequence[str]
+) -> Optional[Callable[[Sequence], List[str]]]:
+    """Build check of rows ordered as columns, None if table has no rules.
+
+    The check returns errors of the row, an empty list for a valid one.
+    """
+    checks = [
+        (columns.index(column), rule)
+        for column, rule in RULES.get(table, {}).items()
+        if column in columns
+    ]
+    if not checks:
+        return None
+
+    def validate(row: Sequence) -> List[str]:
+        errors = (rule(row[index]) for index, rule in checks)
+        return [error for error in errors if error]
+
+    return validate
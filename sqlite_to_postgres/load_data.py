@@ -1,3 +1,6 @@
+import argparse
+import asyncio
+import functools
 import logging
 import sqlite3
 import sys
@@ -7,6 +10,12 @@ import psycopg2
 from psycopg2.extensions import connection as _connection
 from psycopg2.extras import DictCursor
 
+from dataimporter.async_loader import AsyncImporter
+from dataimporter.batching import AdaptiveBatchSize
+from dataimporter.indexes import deferred_indexes_context
+from dataimporter.journal import ProgressJournal
+from dataimporter.keys import KeyIndex
+from dataimporter.loader import load_table, sync_table
 from dataimporter.models import (
     FilmWork,
     Genre,
@@ -14,8 +23,20 @@ from dataimporter.models import (
     Person,
     PersonFilmWork,
 )
-from dataimporter.postgres_saver import PostgresSaver, pg_conn_context
-from dataimporter.sqlite_extractor import SQLiteExtractor, sqlite_conn_context
+from dataimporter.postgres_saver import (
+    PostgresCopySaver,
+    PostgresSaver,
+    pg_conn_context,
+)
+from dataimporter.scheduler import ParallelImporter
+from dataimporter.sqlite_extractor import (
+    SQLiteExtractor,
+    source_time,
+    sqlite_conn_context,
+)
+from dataimporter.stats import ImportStats
+
+TABLES = (Genre, Person, FilmWork, PersonFilmWork, GenreFilmWork)
 
 
 def setup_logger():
@@ -28,36 +49,374 @@ def setup_logger():
     return logger
 
 
-def load_from_sqlite(connection: sqlite3.Connection, pg_conn: _connection):
+SAVERS = {
+    'insert': PostgresSaver,
+    'copy': PostgresCopySaver,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Импорт данных из SQLite в PostgreSQL.'
+    )
+    parser.add_argument(
+        '--saver',
+        choices=SAVERS.keys(),
+        default='insert',
+        help=(
+            'insert - подготовленный INSERT, '
+            'copy - COPY через staging-таблицу'
+        ),
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=config.IMPORT_WORKERS,
+        help='количество таблиц, загружаемых параллельно',
+    )
+    parser.add_argument(
+        '--partitions',
+        type=int,
+        default=config.IMPORT_PARTITIONS,
+        help='на сколько диапазонов rowid делить каждую таблицу',
+    )
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='начать импорт заново, не продолжая прерванный',
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help=(
+            'загрузить только строки, добавленные или изменённые '
+            'после прошлой синхронизации'
+        ),
+    )
+    parser.add_argument(
+        '--since',
+        type=source_time,
+        help=(
+            'для --incremental: загрузить строки, изменённые после '
+            'этого времени (ISO 8601, без смещения - UTC), '
+            'вместо сохранённой отметки'
+        ),
+    )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help=(
+            'читать SQLite и писать в PostgreSQL одновременно '
+            '(asyncio-конвейер с очередью пачек)'
+        ),
+    )
+    parser.add_argument(
+        '--consumers',
+        type=int,
+        default=2,
+        help='для --async: количество соединений, пишущих в PostgreSQL',
+    )
+    parser.add_argument(
+        '--queue-depth',
+        type=int,
+        default=4,
+        help='для --async: сколько прочитанных пачек может ждать записи',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=config.IMPORT_BATCH_SIZE,
+        help='количество строк в пачке',
+    )
+    parser.add_argument(
+        '--adaptive-batch',
+        action='store_true',
+        help=(
+            'подбирать размер пачки каждой таблицы по времени её записи, '
+            '--batch-size задаёт начальный размер'
+        ),
+    )
+    parser.add_argument(
+        '--commit-rows',
+        type=int,
+        default=config.IMPORT_COMMIT_ROWS,
+        help=(
+            'фиксировать транзакцию после каждых N загруженных строк, '
+            '0 - после каждой пачки'
+        ),
+    )
+    parser.add_argument(
+        '--quarantine',
+        action='store_true',
+        help=(
+            'не прерывать загрузку из-за ошибочных строк, а сохранять их '
+            'с описанием ошибки в таблицу content.import_quarantine'
+        ),
+    )
+    parser.add_argument(
+        '--check-keys',
+        action='store_true',
+        help=(
+            'проверять ссылки и естественные ключи в памяти до записи: '
+            'строки связей без фильмов, людей или жанров отправляются '
+            'в карантин, а дубли имён и названий заменяются '
+            'ссылками на уже загруженные строки (включает --quarantine)'
+        ),
+    )
+    parser.add_argument(
+        '--defer-indexes',
+        action='store_true',
+        help=(
+            'для пустых таблиц: удалить неуникальные вторичные индексы '
+            'на время загрузки и построить их параллельно после неё; '
+            'уникальные индексы сохраняются и проверяют дубли'
+        ),
+    )
+    parser.add_argument(
+        '--index-workers',
+        type=int,
+        default=config.IMPORT_INDEX_WORKERS,
+        help='количество индексов, строящихся параллельно после загрузки',
+    )
+    parser.add_argument(
+        '--count-inserted',
+        action='store_true',
+        help=(
+            'для --saver insert: считать вставленные и пропущенные строки, '
+            'это два дополнительных запроса на каждую пачку'
+        ),
+    )
+    parser.add_argument(
+        '--stats-file',
+        help='сохранить итоговую статистику импорта в JSON-файл',
+    )
+    parser.add_argument(
+        '--prometheus-file',
+        help='сохранить статистику в текстовом формате Prometheus',
+    )
+    args = parser.parse_args()
+    if args.check_keys and args.use_async:
+        parser.error('--check-keys не поддерживается вместе с --async')
+    return args
+
+
+def load_from_sqlite(
+    connection: sqlite3.Connection,
+    pg_conn: _connection,
+    saver_class=PostgresSaver,
+    journal: ProgressJournal = None,
+    stats: ImportStats = None,
+    batch_size=100,
+    commit_rows: int = 0,
+    check_keys: bool = False,
+):
     """Основной метод загрузки данных из SQLite в Postgres"""
-    postgres_saver = PostgresSaver(pg_conn)
-    sqlite_extractor = SQLiteExtractor(connection)
-    tables = (Genre, Person, FilmWork, PersonFilmWork, GenreFilmWork)
+    postgres_saver = saver_class(pg_conn, stats=stats)
+    sqlite_extractor = SQLiteExtractor(connection, stats)
+    key_index = KeyIndex(connection, pg_conn, stats) if check_keys else None
+
+    for table in TABLES:
+        load_table(
+            sqlite_extractor,
+            postgres_saver,
+            table,
+            journal,
+            batch_size,
+            commit_rows,
+            key_index,
+        )
+
+
+def sync_from_sqlite(
+    connection: sqlite3.Connection,
+    pg_conn: _connection,
+    journal: ProgressJournal,
+    saver_class=PostgresSaver,
+    since: str = None,
+    stats: ImportStats = None,
+    check_keys: bool = False,
+):
+    """Загрузка только новых и изменённых строк с обновлением в Postgres"""
+    postgres_saver = saver_class(pg_conn, upsert=True, stats=stats)
+    sqlite_extractor = SQLiteExtractor(connection, stats)
+    key_index = KeyIndex(connection, pg_conn, stats) if check_keys else None
+
+    for table in TABLES:
+        sync_table(
+            sqlite_extractor, postgres_saver, table, journal, since, key_index
+        )
+
+
+def load_in_parallel(
+    workers: int,
+    partitions: int = 1,
+    saver_class=PostgresSaver,
+    journal_path: str = None,
+    stats: ImportStats = None,
+    batch_size=100,
+    commit_rows: int = 0,
+    check_keys: bool = False,
+):
+    """Загрузка независимых таблиц параллельно в нескольких процессах"""
+    ParallelImporter(
+        config.SQLITE_DB,
+        config.DATABASE,
+        saver_class,
+        workers,
+        partitions,
+        journal_path,
+        config.SQLITE_OPTIONS,
+        stats,
+        batch_size,
+        commit_rows,
+        check_keys,
+    ).run(TABLES)
+
 
-    def load_and_save(table):
-        with postgres_saver.prepare_insert_context(table):
-            for batch_rows in sqlite_extractor.extract(table):
-                postgres_saver.save(batch_rows, table)
+def load_async(
+    consumers: int,
+    queue_depth: int,
+    saver_class=PostgresSaver,
+    stats: ImportStats = None,
+    batch_size: int = 100,
+):
+    """Загрузка с одновременным чтением SQLite и записью в Postgres"""
+    importer = AsyncImporter(
+        config.SQLITE_DB,
+        config.DATABASE,
+        saver_class,
+        consumers=consumers,
+        queue_depth=queue_depth,
+        batch_size=batch_size,
+        sqlite_options=config.SQLITE_OPTIONS,
+        stats=stats,
+    )
+    asyncio.run(importer.run(TABLES))
 
-    for table in tables:
-        load_and_save(table)
+
+def make_saver_class(args):
+    """Класс сохранения в Postgres, выбранный аргументами"""
+    options = {}
+    # строки, не прошедшие проверку ключей, сохраняются в карантин
+    if args.quarantine or args.check_keys:
+        options['quarantine'] = True
+    if args.count_inserted:
+        options['count_inserted'] = True
+    if options:
+        return functools.partial(SAVERS[args.saver], **options)
+    return SAVERS[args.saver]
+
+
+def full_load(args, journal: ProgressJournal, stats: ImportStats, batch_size):
+    """Полная загрузка всех таблиц выбранным способом"""
+    if args.use_async:
+        load_async(
+            args.consumers,
+            args.queue_depth,
+            make_saver_class(args),
+            stats,
+            args.batch_size,
+        )
+    elif args.workers > 1:
+        load_in_parallel(
+            args.workers,
+            args.partitions,
+            make_saver_class(args),
+            config.IMPORT_JOURNAL,
+            stats,
+            batch_size,
+            args.commit_rows,
+            args.check_keys,
+        )
+    else:
+        with sqlite_conn_context(
+            config.SQLITE_DB, read_only=True, **config.SQLITE_OPTIONS
+        ) as sqlite_conn, pg_conn_context(
+            config.DATABASE, cursor_factory=DictCursor
+        ) as pg_conn:
+            load_from_sqlite(
+                sqlite_conn,
+                pg_conn,
+                make_saver_class(args),
+                journal,
+                stats,
+                batch_size,
+                args.commit_rows,
+                args.check_keys,
+            )
+
+
+def run(args, stats: ImportStats):
+    journal = ProgressJournal(config.IMPORT_JOURNAL)
+    if args.restart:
+        journal.reset()
+
+    batch_size = args.batch_size
+    if args.adaptive_batch:
+        batch_size = AdaptiveBatchSize(
+            initial=args.batch_size,
+            target_seconds=config.IMPORT_BATCH_TARGET_SECONDS,
+            max_bytes=config.IMPORT_BATCH_MAX_BYTES,
+        )
+
+    if args.incremental:
+        with sqlite_conn_context(
+            config.SQLITE_DB, read_only=True, **config.SQLITE_OPTIONS
+        ) as sqlite_conn, pg_conn_context(
+            config.DATABASE, cursor_factory=DictCursor
+        ) as pg_conn:
+            sync_from_sqlite(
+                sqlite_conn,
+                pg_conn,
+                journal,
+                make_saver_class(args),
+                args.since,
+                stats,
+                args.check_keys,
+            )
+    elif args.defer_indexes or journal.deferred_indexes():
+        # индексы, удалённые прерванным запуском, тоже будут восстановлены
+        with deferred_indexes_context(
+            config.DATABASE,
+            [PostgresSaver.model_2_table_name(table) for table in TABLES],
+            journal,
+            args.index_workers,
+            config.IMPORT_MAINTENANCE_WORK_MEM,
+            drop=args.defer_indexes,
+        ):
+            full_load(args, journal, stats, batch_size)
+    else:
+        full_load(args, journal, stats, batch_size)
+
+    # импорт завершён, следующий запуск начнётся с начала
+    journal.reset()
+    journal.close()
+
+
+def report_stats(stats: ImportStats, args, logger):
+    logger.info('Статистика импорта:\n%s', stats.to_text())
+    logger.info(stats.to_json())
+    if args.stats_file:
+        with open(args.stats_file, 'w') as f:
+            f.write(stats.to_json())
+    if args.prometheus_file:
+        with open(args.prometheus_file, 'w') as f:
+            f.write(stats.to_prometheus())
 
 
 if __name__ == '__main__':
+    args = parse_args()
     logger = setup_logger()
+    stats = ImportStats()
 
-    with sqlite_conn_context(
-        config.SQLITE_DB, read_only=True
-    ) as sqlite_conn, pg_conn_context(
-        config.DATABASE, cursor_factory=DictCursor
-    ) as pg_conn:
-        try:
-            load_from_sqlite(sqlite_conn, pg_conn)
-        except psycopg2.Error:
-            logger.exception(
-                'Ошибка PostgreSQL во время импортирования данных.'
-            )
-        except sqlite3.Error:
-            logger.exception('Ошибка SQLite во время выгрузки данных.')
-        except Exception:
-            logger.exception('Ошибка работы скрипта.')
+    try:
+        run(args, stats)
+    except psycopg2.Error:
+        logger.exception('Ошибка PostgreSQL во время импортирования данных.')
+    except sqlite3.Error:
+        logger.exception('Ошибка SQLite во время выгрузки данных.')
+    except Exception:
+        logger.exception('Ошибка работы скрипта.')
+    finally:
+        report_stats(stats, args, logger)
@@ -0,0 +1,107 @@
+import sqlite3
+
+import pytest
+
+from dataimporter import postgres_saver
+
+# columns of the content schema as information_schema returns them
+SCHEMA = {
+    'genre': (
+        ('id', 'uuid'),
+        ('name', 'text'),
+        ('description', 'text'),
+        ('created', 'timestamp with time zone'),
+        ('modified', 'timestamp with time zone'),
+    ),
+}
+
+
+class FakeCursor:
+    """Cursor answering the schema queries of PostgresSaver.
+
+    Reads of a content table give the rows of conn.tables.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def __iter__(self):
+        table = self.query.split('FROM content.')[1].split()[0]
+        return iter(self.conn.tables.get(table, ()))
+
+    def execute(self, query, params=None):
+        self.conn.queries.append(query)
+        self.query = query
+
+    def fetchone(self):
+        if 'md5' in self.query:
+            return (self.conn.fingerprint,)
+        if 'n_tup_ins' in self.query:
+            return (self.conn.inserted,)
+        return (0,)
+
+    def fetchall(self):
+        return [
+            (table, column, data_type)
+            for table, columns in SCHEMA.items()
+            for column, data_type in columns
+        ]
+
+
+class FakeConnection:
+    def __init__(self, fingerprint='0123456789abcdef'):
+        self.fingerprint = fingerprint
+        self.queries = []
+        self.commits = 0
+        # rows counted by pg_stat_xact_user_tables, also rolled back ones
+        self.inserted = 0
+        # rows of content tables by table name
+        self.tables = {}
+
+    def cursor(self, name=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def pg_conn():
+    return FakeConnection()
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Record the arguments of every execute_batch call of the savers."""
+    calls = []
+
+    def execute_batch(curs, query, args, page_size=100):
+        calls.append(
+            {'query': query, 'rows': list(args), 'page_size': page_size}
+        )
+
+    monkeypatch.setattr(postgres_saver, 'execute_batch', execute_batch)
+    return calls
+
+
+@pytest.fixture
+def sqlite_conn():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE genre (id TEXT, name TEXT, description TEXT)')
+    conn.executemany(
+        'INSERT INTO genre VALUES (?, ?, ?)',
+        [
+            (f'00000000-0000-0000-0000-{i:012d}', f'genre {i}', '')
+            for i in range(250)
+        ],
+    )
+    yield conn
+    conn.close()
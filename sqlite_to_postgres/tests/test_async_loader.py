@@ -0,0 +1,109 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import uuid
+
+import psycopg2
+import pytest
+from psycopg2.extensions import parse_dsn
+
+from dataimporter import async_loader
+from dataimporter.models import Genre
+from dataimporter.postgres_saver import PostgresSaver
+
+from conftest import FakeConnection
+
+# libpq connection string of a database with the schema of
+# schema_design/movies_database.ddl, e.g. "dbname=movies_test"
+TEST_DSN = os.getenv('IMPORT_TEST_DSN')
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    path = str(tmp_path / 'source.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE genre (id TEXT, name TEXT, description TEXT)')
+    conn.executemany(
+        'INSERT INTO genre VALUES (?, ?, ?)',
+        [(str(uuid.uuid4()), f'genre {uuid.uuid4()}', '') for _ in range(250)],
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def source_ids(path):
+    conn = sqlite3.connect(path)
+    ids = [row[0] for row in conn.execute('SELECT id FROM genre')]
+    conn.close()
+    return ids
+
+
+class FakePool:
+    """Pool of fake connections recording threads that use them."""
+
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.threads = {}
+
+    def getconn(self):
+        conn = FakeConnection()
+        self.threads[conn] = {threading.get_ident()}
+        return conn
+
+    def putconn(self, conn, close=False):
+        self.threads[conn].add(threading.get_ident())
+
+    def closeall(self):
+        pass
+
+
+def test_consumers_use_connections_in_their_threads(
+    monkeypatch, batches, sqlite_db
+):
+    pools = []
+
+    def make_pool(*args, **kwargs):
+        pools.append(FakePool(*args, **kwargs))
+        return pools[-1]
+
+    def saver_class(conn, **kwargs):
+        pools[0].threads[conn].add(threading.get_ident())
+        return PostgresSaver(conn, **kwargs)
+
+    monkeypatch.setattr(async_loader, 'ThreadedConnectionPool', make_pool)
+    importer = async_loader.AsyncImporter(
+        sqlite_db, {}, saver_class, consumers=3, batch_size=50
+    )
+
+    asyncio.run(importer.run([Genre]))
+
+    (pool,) = pools
+    assert (pool.minconn, pool.maxconn) == (3, 3)
+    assert all(len(threads) == 1 for threads in pool.threads.values())
+    assert sum(len(call['rows']) for call in batches) == 250
+
+
+@pytest.mark.skipif(not TEST_DSN, reason='IMPORT_TEST_DSN is not set')
+def test_import_to_local_postgres(sqlite_db):
+    ids = source_ids(sqlite_db)
+    importer = async_loader.AsyncImporter(
+        sqlite_db, parse_dsn(TEST_DSN), consumers=2, batch_size=50
+    )
+    try:
+        asyncio.run(importer.run([Genre]))
+
+        with psycopg2.connect(TEST_DSN) as conn, conn.cursor() as curs:
+            curs.execute(
+                'SELECT count(*) FROM content.genre '
+                'WHERE id = ANY(%s::uuid[])',
+                (ids,),
+            )
+            assert curs.fetchone()[0] == 250
+    finally:
+        with psycopg2.connect(TEST_DSN) as conn, conn.cursor() as curs:
+            curs.execute(
+                'DELETE FROM content.genre WHERE id = ANY(%s::uuid[])', (ids,)
+            )
@@ -0,0 +1,18 @@
+import pytest
+
+from dataimporter.converters import compile_converter
+
+
+def test_converter_orders_and_fills_target_columns():
+    convert = compile_converter(
+        ('name', 'id', 'description'), ('id', 'name', 'description')
+    )
+
+    assert convert([('Drama', 'genre-id', None)]) == [
+        ('genre-id', 'Drama', '')
+    ]
+
+
+def test_converter_without_target_columns():
+    with pytest.raises(ValueError, match='No target columns'):
+        compile_converter(('id', 'name'), ())
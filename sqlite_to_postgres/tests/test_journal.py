@@ -0,0 +1,43 @@
+from dataimporter.journal import ProgressJournal
+from dataimporter.loader import load_table
+from dataimporter.models import Genre
+from dataimporter.postgres_saver import PostgresSaver
+from dataimporter.sqlite_extractor import KeyRange, SQLiteExtractor
+
+
+def test_pending_parts_skip_progress_of_other_ranges(tmp_path):
+    journal = ProgressJournal(str(tmp_path / 'journal.db'))
+    journal.record(KeyRange('Genre', 0, 50), 20, 20)
+    journal.record(KeyRange('Genre', 50, 100), 100, 50)
+    journal.record(KeyRange('Genre', 100, 150), 120, 20)
+
+    pending = journal.pending(KeyRange('Genre', 0, 200))
+
+    assert [(r.start, r.stop) for r in pending] == [
+        (20, 50),
+        (120, 200),
+    ]
+    assert journal.pending(KeyRange('Person', 0, 200)) == [
+        KeyRange('Person', 0, 200)
+    ]
+
+
+def test_load_resumes_after_run_with_other_partitions(
+    tmp_path, pg_conn, batches, sqlite_conn
+):
+    journal = ProgressJournal(str(tmp_path / 'journal.db'))
+    first, second = SQLiteExtractor(sqlite_conn).split(Genre, 2)
+    journal.record(first, first.stop, first.stop - first.start)
+    journal.record(second, 200, 200 - second.start)
+
+    load_table(
+        SQLiteExtractor(sqlite_conn),
+        PostgresSaver(pg_conn),
+        Genre,
+        journal,
+        batch_size=100,
+    )
+
+    saved = [row[1] for call in batches for row in call['rows']]
+    assert saved == [f'genre {i}' for i in range(200, 250)]
+    assert journal.pending(KeyRange('Genre', 0, 250)) == []
@@ -0,0 +1,110 @@
+import sqlite3
+import uuid
+
+import pytest
+
+from dataimporter.keys import KeyIndex, LinkKeys, natural_key_of
+from dataimporter.stats import ImportStats
+
+FILM_WORK = str(uuid.UUID(int=1))
+OTHER_FILM_WORK = str(uuid.UUID(int=5))
+DRAMA = str(uuid.UUID(int=2))
+DRAMA_COPY = str(uuid.UUID(int=3))
+COMEDY = str(uuid.UUID(int=4))
+LINK_COLUMNS = ('id', 'film_work_id', 'genre_id')
+
+
+def link_key(film_work, genre):
+    return natural_key_of(
+        'genre_film_work', (uuid.UUID(int=film_work), uuid.UUID(int=genre))
+    )
+
+
+def test_link_keys_find_duplicates_after_growing():
+    keys = LinkKeys()
+    assert all(keys.add(link_key(i, 1)) for i in range(5000))
+    assert len(keys) == 5000
+    assert keys.size == 8192
+    assert not any(keys.add(link_key(i, 1)) for i in range(5000))
+    assert keys.add(link_key(1, 2))
+
+
+def test_link_key_depends_on_role():
+    film_work, person = str(uuid.uuid4()), str(uuid.uuid4())
+    actor = natural_key_of('person_film_work', (film_work, person, 'actor'))
+    writer = natural_key_of('person_film_work', (film_work, person, 'writer'))
+    assert actor != writer
+    missing = natural_key_of('person_film_work', (film_work, person, None))
+    assert missing is None
+
+
+@pytest.fixture
+def key_index(pg_conn):
+    """Index of a source with a copy of a genre saved to Postgres."""
+    source = sqlite3.connect(':memory:')
+    source.execute('CREATE TABLE genre (id TEXT, name TEXT)')
+    source.execute(
+        'INSERT INTO genre VALUES (?, ?), (?, ?), (?, ?)',
+        (DRAMA, 'Drama', DRAMA_COPY, 'Drama', COMEDY, 'Comedy'),
+    )
+    source.execute('CREATE TABLE genre_film_work (id TEXT)')
+    pg_conn.tables = {
+        'film_work': [
+            (FILM_WORK, 'Film', None),
+            (OTHER_FILM_WORK, 'Other film', None),
+        ],
+        'genre': [(DRAMA, 'Drama')],
+        'genre_film_work': [(str(uuid.uuid4()), FILM_WORK, DRAMA)],
+    }
+    yield KeyIndex(source, pg_conn, ImportStats())
+    source.close()
+
+
+def link(genre_id, film_work_id=FILM_WORK):
+    return (str(uuid.uuid4()), film_work_id, genre_id)
+
+
+def test_duplicate_parent_is_dropped_and_remapped(key_index):
+    rows = [(DRAMA_COPY, 'Drama'), (COMEDY, 'Comedy')]
+
+    saved, orphans = key_index.check('genre', ('id', 'name'), rows)
+
+    assert saved == [(COMEDY, 'Comedy')]
+    assert orphans == []
+    copy_link = link(DRAMA_COPY)
+    saved, _ = key_index.check('genre_film_work', LINK_COLUMNS, [copy_link])
+    assert saved == []  # remapped to the link saved to Postgres
+    assert key_index.stats.tables['genre'].rows_remapped == 1
+    assert key_index.stats.tables['genre_film_work'].rows_remapped == 1
+
+
+def test_link_to_parent_remapped_in_another_run(key_index):
+    rows = [link(DRAMA_COPY, film_work_id=OTHER_FILM_WORK)]
+
+    saved, orphans = key_index.check('genre_film_work', LINK_COLUMNS, rows)
+
+    assert orphans == []
+    assert [row[2] for row in saved] == [DRAMA]
+
+
+def test_repeated_links_are_dropped(key_index):
+    rows = [link(DRAMA), link(COMEDY), link(COMEDY)]
+    key_index.check('genre', ('id', 'name'), [(COMEDY, 'Comedy')])
+
+    saved, orphans = key_index.check('genre_film_work', LINK_COLUMNS, rows)
+
+    assert saved == [rows[1]]
+    assert orphans == []
+
+
+def test_links_to_missing_or_malformed_parents_are_orphans(key_index):
+    rows = [link(COMEDY), link(None), link('not-a-uuid')]
+
+    saved, orphans = key_index.check('genre_film_work', LINK_COLUMNS, rows)
+
+    assert saved == []
+    assert [error for _, error in orphans] == [
+        f'genre_id {COMEDY} is missing in genre',
+        'genre_id None is not a uuid',
+        "genre_id 'not-a-uuid' is not a uuid",
+    ]
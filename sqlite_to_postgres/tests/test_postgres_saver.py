@@ -0,0 +1,71 @@
+import psycopg2
+
+from dataimporter import postgres_saver
+from dataimporter.loader import load_table
+from dataimporter.models import Genre
+from dataimporter.postgres_saver import PostgresSaver
+from dataimporter.sqlite_extractor import SQLiteExtractor
+from dataimporter.stats import ImportStats
+
+
+def genre_rows(count):
+    return [
+        (f'00000000-0000-0000-0000-{i:012d}', f'genre {i}', '', None, None)
+        for i in range(count)
+    ]
+
+
+def test_save_rows_sends_whole_batch_in_one_page(pg_conn, batches):
+    PostgresSaver(pg_conn).save_checked_rows(genre_rows(250), Genre)
+
+    assert [call['page_size'] for call in batches] == [250]
+
+
+def test_quarantine_sends_whole_batch_in_one_page(pg_conn, batches):
+    PostgresSaver(pg_conn, quarantine=True).save_checked_rows(
+        genre_rows(250), Genre
+    )
+
+    assert [call['page_size'] for call in batches] == [250]
+
+
+def test_batch_size_of_load_is_page_size(pg_conn, batches, sqlite_conn):
+    load_table(
+        SQLiteExtractor(sqlite_conn),
+        PostgresSaver(pg_conn),
+        Genre,
+        batch_size=120,
+    )
+
+    assert [len(call['rows']) for call in batches] == [120, 120, 10]
+    assert [call['page_size'] for call in batches] == [120, 120, 10]
+
+
+def test_rows_rolled_back_to_savepoint_are_not_counted(pg_conn, monkeypatch):
+    rows = genre_rows(250)
+    bad_row = rows[200]
+
+    def execute_batch(curs, query, args, page_size=100):
+        for row in args:
+            if row is bad_row:
+                raise psycopg2.DataError('bad row')
+            curs.conn.inserted += 1
+
+    monkeypatch.setattr(postgres_saver, 'execute_batch', execute_batch)
+    stats = ImportStats()
+    saver = PostgresSaver(
+        pg_conn, stats=stats, quarantine=True, count_inserted=True
+    )
+    saver.save_checked_rows(rows, Genre)
+
+    assert stats.tables['genre'].rows_inserted == 249
+    assert stats.tables['genre'].rows_skipped == 0
+    assert stats.tables['genre'].rows_quarantined == 1
+
+
+def test_inserted_rows_are_counted_only_on_request(pg_conn, batches):
+    PostgresSaver(pg_conn, stats=ImportStats()).save_rows(
+        genre_rows(10), Genre
+    )
+
+    assert not [query for query in pg_conn.queries if 'n_tup_ins' in query]
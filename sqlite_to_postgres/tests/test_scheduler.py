@@ -0,0 +1,42 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+from dataimporter import scheduler
+from dataimporter.models import Genre
+
+
+def fail_first_range(
+    sqlite_db, dsn, saver_class, model, key_range, log_dir, *args
+):
+    if key_range.start == 0:
+        raise ValueError('range failed')
+    time.sleep(0.1)
+    open(os.path.join(log_dir, str(key_range.start)), 'w').close()
+    return model, {}
+
+
+def test_failed_range_cancels_pending_ones(tmp_path, monkeypatch):
+    path = str(tmp_path / 'source.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE genre (id TEXT, name TEXT, description TEXT)')
+    conn.executemany(
+        'INSERT INTO genre VALUES (?, ?, ?)',
+        [(str(i), f'genre {i}', '') for i in range(100)],
+    )
+    conn.commit()
+    conn.close()
+    log_dir = tmp_path / 'ranges'
+    log_dir.mkdir()
+    monkeypatch.setattr(scheduler, 'import_range', fail_first_range)
+
+    importer = scheduler.ParallelImporter(
+        path, {}, workers=1, partitions=10, journal_path=str(log_dir)
+    )
+    with pytest.raises(ValueError, match='range failed'):
+        importer.run([Genre])
+
+    # ranges queued to the worker before the failure still run
+    assert len(os.listdir(log_dir)) <= 2
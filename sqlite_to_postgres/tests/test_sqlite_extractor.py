@@ -0,0 +1,67 @@
+import sqlite3
+
+from dataimporter.models import Genre
+from dataimporter.sqlite_extractor import (
+    KeyRange,
+    SQLiteExtractor,
+    source_time,
+)
+
+
+def test_source_time_matches_stored_timestamps():
+    assert source_time('2021-06-16T00:00:00') == '2021-06-16 00:00:00'
+    assert source_time('2021-06-16T23:30:00+03:00') == '2021-06-16 20:30:00'
+    assert source_time('2021-06-16 20:14:09.5') == (
+        '2021-06-16 20:14:09.500000'
+    )
+
+
+def test_changed_rows_after_iso_time():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        'CREATE TABLE genre (id TEXT, name TEXT, description TEXT, '
+        'updated_at TEXT)'
+    )
+    conn.executemany(
+        'INSERT INTO genre VALUES (?, ?, ?, ?)',
+        [
+            ('1', 'Old', '', '2021-06-15 20:14:09+00'),
+            ('2', 'Changed', '', '2021-06-16 20:14:09+00'),
+        ],
+    )
+
+    batches = SQLiteExtractor(conn).extract_changed(
+        Genre,
+        since_key=2,
+        since_modified=source_time('2021-06-16T00:00:00'),
+    )
+
+    assert [genre.name for _, batch in batches for genre in batch] == [
+        'Changed'
+    ]
+
+
+def test_split_covers_all_rowids(sqlite_conn):
+    ranges = SQLiteExtractor(sqlite_conn).split(Genre, 4)
+
+    assert [(r.start, r.stop) for r in ranges] == [
+        (0, 63),
+        (63, 126),
+        (126, 189),
+        (189, 250),
+    ]
+
+
+def test_extract_range_yields_last_rowid_of_batches(sqlite_conn):
+    extractor = SQLiteExtractor(sqlite_conn)
+
+    batches = list(
+        extractor.extract_range(Genre, KeyRange('Genre', 100, 130), 20)
+    )
+
+    assert [(last_key, len(batch)) for last_key, batch in batches] == [
+        (120, 20),
+        (130, 10),
+    ]
+    assert batches[0][1][0].name == 'genre 100'
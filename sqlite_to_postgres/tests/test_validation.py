@@ -0,0 +1,21 @@
+from dataimporter.validation import build_validator
+
+COLUMNS = ('id', 'title', 'rating', 'type')
+
+
+def test_rating_is_checked_by_value():
+    validate = build_validator('film_work', COLUMNS)
+
+    assert validate(('1', 'Film', 7.5, 'movie')) == []
+    assert validate(('1', 'Film', '7.5', 'movie')) == []
+    assert validate(('1', 'Film', 101, 'movie')) == [
+        'rating 101 is out of range 0..100'
+    ]
+
+
+def test_non_numeric_rating_is_an_error():
+    validate = build_validator('film_work', COLUMNS)
+
+    assert validate(('1', 'Film', 'great', 'movie')) == [
+        "rating 'great' is not a number"
+    ]
@@ -1,7 +1,11 @@
+import argparse
+import hashlib
 import os
 import sqlite3
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from string import Template
+from typing import Dict, Tuple
 
 from psycopg2.extensions import connection as _connection
 from psycopg2.extras import DictCursor
@@ -39,45 +43,236 @@ def test_integrity(sqlite_curs, pg_curs):
         )
 
 
-def test_tables_values(sqlite_curs, pg_curs):
-    """Check table rows values from SQLite are equal ones in PostgreSQL."""
-    tables = (
-        "genre",
-        "person",
-        "film_work",
-        "person_film_work",
-        "genre_film_work",
+COLUMNS = {
+    "genre": ("id", "name", "description"),
+    "person": ("id", "full_name"),
+    "film_work": (
+        "id",
+        "title",
+        "description",
+        "creation_date",
+        "file_path",
+        "rating",
+        "type",
+    ),
+    "person_film_work": ("id", "film_work_id", "person_id", "role"),
+    "genre_film_work": ("id", "film_work_id", "genre_id"),
+}
+
+SQLITE_CHUNK_QUERY = Template(
+    "SELECT $columns FROM $table WHERE id > ? ORDER BY id LIMIT ?"
+)
+SQLITE_RANGE_QUERY = Template(
+    "SELECT $columns FROM $table WHERE id > ? AND id <= ? ORDER BY id"
+)
+PG_RANGE_QUERY = Template(
+    "SELECT $columns FROM $table "
+    "WHERE id > %s::uuid AND id <= %s::uuid ORDER BY id"
+)
+PG_TAIL_QUERY = Template("SELECT COUNT(*) FROM $table WHERE id > %s::uuid")
+
+# ids are read strictly after the last key, starting with the nil uuid
+FIRST_KEY = "00000000-0000-0000-0000-000000000000"
+
+
+def canonical(row) -> str:
+    """Render row as text equal for both databases.
+
+    NULL description and rating are replaced with the defaults
+    used by the importer, other NULLs are rendered as \\N.
+    """
+    return "\t".join(
+        "\\N" if value is None else str(value)
+        for value in SQLiteExtractor.transform(row).values()
     )
 
-    queries = {
-        "genre": ("SELECT id, name, description FROM genre;"),
-        "person": "SELECT id, full_name FROM person",
-        "film_work": (
-            "SELECT id, title, description, creation_date, file_path, "
-            "rating, type FROM film_work;"
-        ),
-        "person_film_work": (
-            "SELECT id, film_work_id, person_id, role FROM person_film_work"
-        ),
-        "genre_film_work": (
-            "SELECT id, film_work_id, genre_id FROM genre_film_work"
-        ),
-    }
 
-    for table in tables:
-        sqlite_curs.execute(queries[table])
-        pg_curs.execute(queries[table])
-        sqlite_rows = map(SQLiteExtractor.transform, sqlite_curs.fetchall())
-        pg_rows = map(SQLiteExtractor.transform, pg_curs.fetchall())
-        for sqlite_row, pg_row in zip(sqlite_rows, pg_rows):
-            for sqlite_item, pg_item in zip(
-                sqlite_row.items(), pg_row.items()
-            ):
-                assert sqlite_item[1] == pg_item[1], (
-                    f"В таблице {table} значение колонки {sqlite_item[0]} "
-                    f"в SQLite {sqlite_item[1]} не равно значению "
-                    f"в PostgreSQL {pg_item[1]}"
+def chunk_digest(rows) -> Tuple[str, str, int]:
+    """Return md5 of canonical rows, the last id and the number of rows."""
+    digest = hashlib.md5()
+    last_key, count = None, 0
+    for row in rows:
+        digest.update(canonical(row).encode())
+        digest.update(b"\n")
+        last_key, count = str(row["id"]), count + 1
+    return digest.hexdigest(), last_key, count
+
+
+def compare_rows(table, sqlite_rows, pg_rows):
+    """Find rows which differ in a mismatched chunk."""
+    sqlite_rows = {str(row["id"]): canonical(row) for row in sqlite_rows}
+    pg_rows = {str(row["id"]): canonical(row) for row in pg_rows}
+    for key in sorted(sqlite_rows.keys() | pg_rows.keys()):
+        assert key in pg_rows, (
+            f"В таблице {table} строка {key} отсутствует в PostgreSQL"
+        )
+        assert key in sqlite_rows, (
+            f"В таблице {table} строка {key} отсутствует в SQLite"
+        )
+        assert sqlite_rows[key] == pg_rows[key], (
+            f"В таблице {table} строка {key} в SQLite {sqlite_rows[key]} "
+            f"не равна строке в PostgreSQL {pg_rows[key]}"
+        )
+
+
+def test_tables_values(sqlite_curs, pg_curs, chunk_size=10_000):
+    """Check table rows values from SQLite are equal ones in PostgreSQL.
+
+    Both tables are read in chunks sorted by id. A SQLite chunk sets
+    the id range of the PostgreSQL one, so a missing row spoils only
+    its own chunk. Chunks are compared by digests, and rows are
+    compared only when digests differ.
+    """
+    for table, columns in COLUMNS.items():
+        columns = ", ".join(columns)
+        last_key = FIRST_KEY
+        while True:
+            sqlite_curs.execute(
+                SQLITE_CHUNK_QUERY.substitute(table=table, columns=columns),
+                (last_key, chunk_size),
+            )
+            sqlite_digest, stop_key, count = chunk_digest(sqlite_curs)
+            if not count:
+                break
+            pg_curs.execute(
+                PG_RANGE_QUERY.substitute(table=table, columns=columns),
+                (last_key, stop_key),
+            )
+            pg_digest, _, _ = chunk_digest(pg_curs)
+            if sqlite_digest != pg_digest:
+                sqlite_curs.execute(
+                    SQLITE_RANGE_QUERY.substitute(
+                        table=table, columns=columns
+                    ),
+                    (last_key, stop_key),
                 )
+                pg_curs.execute(
+                    PG_RANGE_QUERY.substitute(table=table, columns=columns),
+                    (last_key, stop_key),
+                )
+                compare_rows(table, sqlite_curs.fetchall(), pg_curs.fetchall())
+            last_key = stop_key
+
+        pg_curs.execute(PG_TAIL_QUERY.substitute(table=table), (last_key,))
+        extra = pg_curs.fetchone()[0]
+        assert not extra, (
+            f"В таблице {table} в PostgreSQL {extra} лишних строк "
+            f"после {last_key}"
+        )
+
+
+def sqlite_expression(column: str) -> str:
+    """Canonical text of a SQLite column, equal to the PostgreSQL one."""
+    if column == "id" or column.endswith("_id"):
+        return f"lower({column})"
+    if column == "description":
+        return "coalesce(description, '')"
+    if column == "rating":
+        return "CAST(round(coalesce(rating, 0) * 1000000) AS INTEGER)"
+    if column == "creation_date":
+        return "coalesce(date(creation_date), '\\N')"
+    return f"coalesce({column}, '\\N')"
+
+
+def pg_expression(column: str) -> str:
+    """Canonical text of a PostgreSQL column, equal to the SQLite one."""
+    if column == "id" or column.endswith("_id"):
+        return f"{column}::text"
+    if column == "description":
+        return "coalesce(description, '')"
+    if column == "rating":
+        return "round(coalesce(rating, 0)::numeric * 1000000)::bigint"
+    if column == "creation_date":
+        return "coalesce(creation_date::text, '\\N')"
+    return f"coalesce({column}, '\\N')"
+
+
+# rows are grouped into 256 buckets by the first byte of id
+SQLITE_CHECKSUM_QUERY = Template(
+    "SELECT substr(lower(id), 1, 2) AS bucket, COUNT(*), "
+    "md5_sum($row) FROM $table GROUP BY bucket"
+)
+PG_CHECKSUM_QUERY = Template(
+    "SELECT substr(id::text, 1, 2) AS bucket, COUNT(*), "
+    "sum(('x' || substr(md5($row), 1, 16))::bit(64)::bigint)::text "
+    "FROM $table GROUP BY bucket"
+)
+
+
+def md5_prefix(text: str) -> int:
+    """First 8 bytes of md5 as signed bigint, as PostgreSQL casts them."""
+    digest = hashlib.md5(text.encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+class Md5Sum:
+    """SQLite aggregate summing md5 prefixes of rows.
+
+    The sum does not depend on the order of rows and is kept as
+    Python int, so it does not overflow like SQLite sum() would.
+    """
+
+    def __init__(self):
+        self.total = 0
+
+    def step(self, value: str):
+        self.total += md5_prefix(value)
+
+    def finalize(self) -> str:
+        return str(self.total)
+
+
+def sqlite_checksums(table: str) -> Dict[str, Tuple[int, str]]:
+    row = " || char(9) || ".join(map(sqlite_expression, COLUMNS[table]))
+    with sqlite_conn_context(
+        config.SQLITE_DB, read_only=True
+    ) as sqlite_conn:
+        sqlite_conn.create_aggregate("md5_sum", 1, Md5Sum)
+        rows = sqlite_conn.execute(
+            SQLITE_CHECKSUM_QUERY.substitute(table=table, row=row)
+        ).fetchall()
+    return {bucket: (count, digest) for bucket, count, digest in rows}
+
+
+def pg_checksums(table: str) -> Dict[str, Tuple[int, str]]:
+    row = ", ".join(map(pg_expression, COLUMNS[table]))
+    with pg_conn_context(config.DATABASE, cursor_factory=DictCursor) as conn:
+        pg_curs = conn.cursor()
+        pg_curs.execute(
+            PG_CHECKSUM_QUERY.substitute(
+                table=table, row=f"concat_ws(E'\\t', {row})"
+            )
+        )
+        rows = pg_curs.fetchall()
+    return {bucket: (count, digest) for bucket, count, digest in rows}
+
+
+def test_tables_checksums(workers=len(COLUMNS)):
+    """Check tables by checksums computed inside each database.
+
+    Only per-bucket row counts and digests leave the databases.
+    Each table is checked in its own thread on own connections.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        checksums = {
+            table: (
+                pool.submit(sqlite_checksums, table),
+                pool.submit(pg_checksums, table),
+            )
+            for table in COLUMNS
+        }
+    for table, (sqlite_future, pg_future) in checksums.items():
+        sqlite_buckets = sqlite_future.result()
+        pg_buckets = pg_future.result()
+        mismatched = sorted(
+            bucket
+            for bucket in sqlite_buckets.keys() | pg_buckets.keys()
+            if sqlite_buckets.get(bucket) != pg_buckets.get(bucket)
+        )
+        assert not mismatched, (
+            f"В таблице {table} не совпадают строки с id, "
+            f"начинающимся на {', '.join(mismatched)}"
+        )
 
 
 def check_consistency(connection: sqlite3.Connection, pg_conn: _connection):
@@ -92,9 +287,26 @@ def check_consistency(connection: sqlite3.Connection, pg_conn: _connection):
 
 
 if __name__ == "__main__":
-    with sqlite_conn_context(
-        config.SQLITE_DB, read_only=True
-    ) as sqlite_conn, pg_conn_context(
-        config.DATABASE, cursor_factory=DictCursor
-    ) as pg_conn:
-        check_consistency(sqlite_conn, pg_conn)
+    parser = argparse.ArgumentParser(
+        description="Проверка данных, перенесённых из SQLite в PostgreSQL."
+    )
+    parser.add_argument(
+        "--mode",
+        choices=("checksum", "rows"),
+        default="checksum",
+        help=(
+            "checksum - сравнить контрольные суммы, посчитанные в базах, "
+            "rows - сравнить строки и найти отличающиеся"
+        ),
+    )
+    args = parser.parse_args()
+
+    if args.mode == "checksum":
+        test_tables_checksums()
+    else:
+        with sqlite_conn_context(
+            config.SQLITE_DB, read_only=True
+        ) as sqlite_conn, pg_conn_context(
+            config.DATABASE, cursor_factory=DictCursor
+        ) as pg_conn:
+            check_consistency(sqlite_conn, pg_conn)